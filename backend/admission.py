@@ -0,0 +1,205 @@
+"""Контроль допуска: лимиты конкурентности по классам маршрутов и rate limit.
+
+Классы маршрутов: auth (вход/регистрация, дорогое хеширование паролей),
+write (изменяющие запросы) и read (все остальное). Запрос сверх лимита
+отклоняется сразу, а не встает в очередь к общим воркерам.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenBucket:
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, cost=1):
+        """Возвращает 0, если cost токенов выдано, иначе сколько секунд ждать, пока их хватит"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0
+        return (cost - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Token bucket на каждый ключ (клиент или пользователь), число ключей ограничено"""
+
+    def __init__(self, rate, burst, max_keys=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()
+
+    def take(self, key, cost=1):
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            return bucket.take(cost)
+
+
+class AdmissionTicket:
+    """Занятый слот класса; release() можно вызывать повторно, слот освобождается один раз"""
+    __slots__ = ('limiter', 'started', 'released')
+
+    def __init__(self, limiter, started):
+        self.limiter = limiter
+        self.started = started
+        self.released = False
+
+    def release(self):
+        self.limiter.release(self)
+
+
+class ConcurrencyLimiter:
+    """Семафор с изменяемым лимитом, замером ожидания в очереди и полного времени запроса"""
+
+    def __init__(self, limit, queue_timeout):
+        self.max_limit = limit
+        self.limit = limit
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.rejected = 0
+        self.queue_wait_ms = 0.0
+        self.latency_ms = 0.0
+        self._window = [0, 0.0, 0]  # завершено, суммарное время (мс), отклонено
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout=None):
+        """Возвращает AdmissionTicket или None, если слот не получен"""
+        started = time.monotonic()
+        with self._cond:
+            acquired = self._cond.wait_for(lambda: self.active < self.limit,
+                                           self.queue_timeout if timeout is None else timeout)
+            if not acquired:
+                self.rejected += 1
+                self._window[2] += 1
+                return None
+            self.active += 1
+            waited = (time.monotonic() - started) * 1000
+            # экспоненциальное скользящее среднее времени ожидания
+            self.queue_wait_ms += (waited - self.queue_wait_ms) * 0.1
+            return AdmissionTicket(self, started)
+
+    def release(self, ticket):
+        elapsed = (time.monotonic() - ticket.started) * 1000
+        with self._cond:
+            if ticket.released:
+                return
+            ticket.released = True
+            self.active -= 1
+            self.latency_ms += (elapsed - self.latency_ms) * 0.1
+            self._window[0] += 1
+            self._window[1] += elapsed
+            self._cond.notify()
+
+    def take_window(self):
+        """Возвращает (завершено, среднее время мс, отклонено) с прошлого вызова и начинает новое окно"""
+        with self._cond:
+            completed, total_ms, rejected = self._window
+            self._window = [0, 0.0, 0]
+        return completed, total_ms / completed if completed else 0.0, rejected
+
+    def set_limit(self, limit):
+        with self._cond:
+            self.limit = max(1, min(self.max_limit, limit))
+            self._cond.notify_all()
+
+    def stats(self):
+        return {
+            'limit': self.limit,
+            'max_limit': self.max_limit,
+            'active': self.active,
+            'rejected': self.rejected,
+            'queue_wait_ms': round(self.queue_wait_ms, 2),
+            'latency_ms': round(self.latency_ms, 2)
+        }
+
+
+class AdmissionController:
+    # POST-маршруты, которые только читают данные
+    read_only_paths = ('/api/batch',)
+
+    def __init__(self, concurrency, queue_timeout, client_rate, user_rate,
+                 adaptive=False, target_latency_ms=50.0, adapt_interval=0.5):
+        self.limiters = {name: ConcurrencyLimiter(limit, queue_timeout)
+                         for name, limit in concurrency.items()}
+        self.client_limiter = RateLimiter(*client_rate)
+        self.user_limiter = RateLimiter(*user_rate)
+        self.adaptive = adaptive
+        self.target_latency_ms = target_latency_ms
+        self.adapt_interval = adapt_interval
+        self.read_latency_ms = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def classify(method, path):
+        if path.startswith('/auth/'):
+            return 'auth'
+        if method not in ('GET', 'HEAD', 'OPTIONS') and path not in AdmissionController.read_only_paths:
+            return 'write'
+        return 'read'
+
+    def check_rate(self, client_id, user_id=None, cost=1):
+        """Возвращает Retry-After в секундах или 0, если запрос (cost токенов) укладывается в лимиты"""
+        retry_after = self.client_limiter.take(client_id, cost)
+        if not retry_after and user_id is not None:
+            retry_after = self.user_limiter.take(user_id, cost)
+        return math.ceil(retry_after)
+
+    def acquire(self, route_class, timeout=None):
+        """Возвращает AdmissionTicket или None, если запрос нужно отклонить;
+        timeout=0 не ждет освобождения слота (для event loop)"""
+        if self.adaptive:
+            self._ensure_started()
+        return self.limiters[route_class].acquire(timeout)
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='admission-adapt', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.adapt_interval)
+            self._adapt()
+
+    def _adapt(self):
+        """AIMD по таймеру: медленное или отклоняемое чтение ужимает auth и write, быстрое или его
+        отсутствие постепенно их отпускает"""
+        completed, latency_ms, rejected = self.limiters['read'].take_window()
+        self.read_latency_ms = round(latency_ms, 2) if completed else None
+        overloaded = rejected > 0 or latency_ms > self.target_latency_ms
+        for name, limiter in self.limiters.items():
+            if name == 'read':
+                continue
+            if overloaded:
+                limiter.set_limit(limiter.limit // 2)
+            elif latency_ms < self.target_latency_ms / 2 and limiter.limit < limiter.max_limit:
+                limiter.set_limit(limiter.limit + 1)
+
+    def stats(self):
+        return {
+            'adaptive': self.adaptive,
+            'target_latency_ms': self.target_latency_ms,
+            'read_latency_ms': self.read_latency_ms,
+            'classes': {name: limiter.stats() for name, limiter in self.limiters.items()}
+        }
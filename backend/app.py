@@ -1,16 +1,107 @@
 from flask import Flask, request, jsonify, abort, make_response
+from werkzeug.exceptions import HTTPException
+from werkzeug.middleware.proxy_fix import ProxyFix
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import func, text, update, insert, literal, bindparam, select, inspect, event
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from collections import namedtuple
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from datetime import datetime
+from functools import wraps, lru_cache
+from urllib.parse import urlencode
 from jwt_auth import JWTManager, jwt_required
+from singleflight import SingleFlight, SingleFlightTimeout
+from admission import AdmissionController
+from groupcommit import GroupCommitQueue
+from objcache import ReadThroughCache, UserSummary, ArticleSummary
+from maintenance import MaintenanceScheduler
+from feeds import FeedSnapshots
+from counters import ShardedCounter
+from backup import backup_database, restore_database, BackupError
 from werkzeug.security import generate_password_hash, check_password_hash
 import secrets
+import sqlite3
+import os
+import json
+import math
+import threading
+import time
+import click
 
 app = Flask(__name__)
 app.secret_key = secrets.token_hex(16)
 
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///blog.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///blog.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.json.ensure_ascii = False
+app.config['SINGLE_FLIGHT_TIMEOUT'] = float(os.environ.get('SINGLE_FLIGHT_TIMEOUT', 5))
+
+# Контроль допуска: одновременных запросов на класс маршрутов и (запросов/с, всплеск)
+app.config['ADMISSION_ENABLED'] = os.environ.get('ADMISSION_ENABLED', '1') == '1'
+app.config['ADMISSION_CONCURRENCY'] = {
+    'auth': int(os.environ.get('ADMISSION_AUTH_CONCURRENCY', 4)),
+    'write': int(os.environ.get('ADMISSION_WRITE_CONCURRENCY', 8)),
+    'read': int(os.environ.get('ADMISSION_READ_CONCURRENCY', 64))
+}
+app.config['ADMISSION_QUEUE_TIMEOUT'] = 0.1
+# Rate limit по адресу клиента и пользователю включается отдельно. За reverse proxy
+# нужно указать PROXY_FIX_HOPS (число доверенных прокси), иначе адрес клиента берется
+# из соединения и все пользователи делят один bucket прокси
+app.config['RATE_LIMIT_ENABLED'] = os.environ.get('RATE_LIMIT_ENABLED', '0') == '1'
+app.config['PROXY_FIX_HOPS'] = int(os.environ.get('PROXY_FIX_HOPS', 0))
+app.config['RATE_LIMIT_PER_CLIENT'] = (50, 100)
+app.config['RATE_LIMIT_PER_USER'] = (20, 40)
+app.config['ADMISSION_ADAPTIVE'] = os.environ.get('ADMISSION_ADAPTIVE', '0') == '1'
+app.config['ADMISSION_TARGET_LATENCY_MS'] = 50
+
+# Групповой commit комментариев: пачка закрывается по времени (мс) или по числу строк
+app.config['COMMENT_GROUP_COMMIT'] = os.environ.get('COMMENT_GROUP_COMMIT', '0') == '1'
+app.config['COMMENT_GROUP_COMMIT_INTERVAL_MS'] = 5
+app.config['COMMENT_GROUP_COMMIT_MAX_BATCH'] = 100
+app.config['COMMENT_GROUP_COMMIT_TIMEOUT'] = 5
+
+# Кэш сводок пользователей и статей: записей на тип и время жизни, с
+app.config['OBJECT_CACHE_SIZE'] = 1000
+app.config['OBJECT_CACHE_TTL'] = 60
+
+# Удаление статей: сразу одним DELETE по комментариям или мягко, с очисткой пачками в фоне
+# (задача purge_deleted_articles запускается и без MAINTENANCE_SCHEDULER)
+app.config['ARTICLE_ASYNC_DELETE'] = os.environ.get('ARTICLE_ASYNC_DELETE', '0') == '1'
+app.config['ARTICLE_PURGE_CHUNK'] = 1000
+
+# Готовые ленты: статей в ленте, как часто сверяться с БД (с), файл снимка (необязательно)
+app.config['FEED_SNAPSHOT_SIZE'] = 50
+app.config['FEED_SNAPSHOT_CHECK_INTERVAL'] = 1.0
+app.config['FEED_SNAPSHOT_PATH'] = os.environ.get('FEED_SNAPSHOT_PATH')
+
+# Обслуживание БД в фоновом потоке (или отдельным процессом: flask maintenance --loop)
+# Счетчики просмотров пишутся в БД пачкой раз в VIEW_FLUSH_INTERVAL секунд;
+# в trending статья, которая на TRENDING_DECAY_HOURS часов свежее, весит как
+# в 10 раз больше просмотров
+app.config['VIEW_COUNTER_SHARDS'] = 16
+app.config['VIEW_FLUSH_INTERVAL'] = float(os.environ.get('VIEW_FLUSH_INTERVAL', 5))
+app.config['TRENDING_DECAY_HOURS'] = 12.5
+
+# Онлайн-бэкап: снимки в BACKUP_DIR (по умолчанию instance/backups), шаг копирования
+# BACKUP_PAGES страниц с паузой BACKUP_STEP_PAUSE секунд между шагами (0 - без пауз);
+# POST /api/admin/backup доступен пользователям из ADMIN_EMAILS
+app.config['BACKUP_DIR'] = os.environ.get('BACKUP_DIR')
+app.config['BACKUP_PAGES'] = 256
+app.config['BACKUP_STEP_PAUSE'] = float(os.environ.get('BACKUP_STEP_PAUSE', 0))
+app.config['ADMIN_EMAILS'] = [email.strip() for email in os.environ.get('ADMIN_EMAILS', '').split(',') if email.strip()]
+
+app.config['MAINTENANCE_SCHEDULER'] = os.environ.get('MAINTENANCE_SCHEDULER', '0') == '1'
+# Режим WAL для SQLite: читатели не ждут писателей, работают checkpoint и онлайн-бэкап
+app.config['SQLITE_WAL'] = os.environ.get('SQLITE_WAL', '1') == '1'
+
+# Пакетное чтение: id в одном запросе и подзапросов в /api/batch
+app.config['MAX_BATCH_IDS'] = 100
+app.config['MAX_BATCH_REQUESTS'] = 20
+
+if app.config['PROXY_FIX_HOPS']:
+    # request.remote_addr берется из X-Forwarded-For, выставленного доверенными прокси
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_HOPS'])
+
 
 @app.after_request
 def add_cors(response):
@@ -30,6 +121,61 @@ def handle_options():
 
 db = SQLAlchemy(app)
 
+admission = AdmissionController(
+    app.config['ADMISSION_CONCURRENCY'],
+    app.config['ADMISSION_QUEUE_TIMEOUT'],
+    app.config['RATE_LIMIT_PER_CLIENT'],
+    app.config['RATE_LIMIT_PER_USER'],
+    adaptive=app.config['ADMISSION_ADAPTIVE'],
+    target_latency_ms=app.config['ADMISSION_TARGET_LATENCY_MS']
+)
+
+
+def overload_response(status, error, retry_after=1):
+    response = jsonify({
+        'success': False,
+        'error': error
+    })
+    response.status_code = status
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+@app.before_request
+def admit_request():
+    """Сразу отклоняет запрос сверх rate limit или лимита конкурентности его класса"""
+    if request.method == 'OPTIONS' or not app.config['ADMISSION_ENABLED']:
+        return
+    
+    if app.config['RATE_LIMIT_ENABLED']:
+        user_id = None
+        auth_header = request.headers.get('Authorization', '')
+        if auth_header.startswith('Bearer '):
+            payload = JWTManager.verify_access_token(auth_header[7:])
+            if payload:
+                user_id = payload['user_id']
+        
+        retry_after = admission.check_rate(request.remote_addr, user_id)
+        if retry_after:
+            return overload_response(429, 'Слишком много запросов', retry_after)
+        request.rate_identity = (request.remote_addr, user_id)
+    
+    # слот класса мог быть уже занят ASGI-слоем до постановки в пул потоков (asgi.py)
+    ticket = request.environ.get('news_api.admission_ticket')
+    if ticket is None:
+        ticket = admission.acquire(admission.classify(request.method, request.path))
+        if ticket is None:
+            return overload_response(503, 'Сервер перегружен, повторите запрос позже')
+    request.admission_ticket = ticket
+
+
+@app.teardown_request
+def release_admission(exc):
+    ticket = getattr(request, 'admission_ticket', None)
+    if ticket:
+        ticket.release()
+
+
 # Middleware
 @app.before_request
 def check_jwt_for_api():
@@ -42,7 +188,11 @@ def check_jwt_for_api():
         if request.path in public_routes:
             return
         
-        if request.method == 'GET' and ('/articles' in request.path or '/comments' in request.path):
+        if request.method == 'GET' and ('/articles' in request.path or '/comments' in request.path
+                                        or request.path == '/api/stats'):
+            return
+        
+        if request.path == '/api/batch':
             return
         
         auth_header = request.headers.get('Authorization')
@@ -115,8 +265,18 @@ class Article(db.Model):
     title = db.Column(db.String(200), nullable=False)
     text = db.Column(db.Text, nullable=False)
     category = db.Column(db.String(50), default='general')
-    created_date = db.Column(db.DateTime, default=datetime.utcnow)
+    created_date = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    deleted_at = db.Column(db.DateTime, index=True)
+    views = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    trending = db.Column(db.Float, nullable=False, default=0, server_default='0')
+
+    # ленты по дате и сортировки popular и trending читают живые статьи прямо в порядке индекса
+    __table_args__ = (
+        db.Index('ix_article_live_date', 'deleted_at', 'created_date'),
+        db.Index('ix_article_live_views', 'deleted_at', 'views'),
+        db.Index('ix_article_live_trending', 'deleted_at', 'trending'),
+    )
 
     def __repr__(self):
         return f'<Article {self.title}>'
@@ -126,7 +286,7 @@ class Comment(db.Model):
     text = db.Column(db.Text, nullable=False)
     author_name = db.Column(db.String(100), nullable=False)
     created_date = db.Column(db.DateTime, default=datetime.utcnow)
-    article_id = db.Column(db.Integer, db.ForeignKey('article.id'), nullable=False)
+    article_id = db.Column(db.Integer, db.ForeignKey('article.id'), nullable=False, index=True)
     
     article = db.relationship('Article', backref=db.backref('comments', lazy=True, cascade='all, delete-orphan'))
     
@@ -134,22 +294,293 @@ class Comment(db.Model):
         return f'<Comment {self.text[:20]}...>'
 
 
+class CategoryStats(db.Model):
+    """Счетчики по категории, обновляются в транзакциях обработчиков записи"""
+    category = db.Column(db.String(50), primary_key=True)
+    articles_count = db.Column(db.Integer, nullable=False, default=0)
+    comments_count = db.Column(db.Integer, nullable=False, default=0)
+    last_activity = db.Column(db.DateTime)
+
+
+class AuthorStats(db.Model):
+    """Счетчики по автору: его статьи и комментарии к ним"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    articles_count = db.Column(db.Integer, nullable=False, default=0)
+    comments_count = db.Column(db.Integer, nullable=False, default=0)
+    last_activity = db.Column(db.DateTime)
+
+    user = db.relationship('User')
+
+
+def load_user_summary(user_id):
+    row = db.session.query(User.id, User.name, User.email).filter_by(id=user_id).first()
+    return UserSummary(id=row.id, name=row.name, email=row.email) if row else None
+
+
+def load_article_summary(article_id):
+    row = db.session.query(Article.id, Article.title, Article.category, Article.user_id)\
+        .filter_by(id=article_id, deleted_at=None).first()
+    return ArticleSummary(id=row.id, title=row.title, category=row.category,
+                          user_id=row.user_id) if row else None
+
+
+user_cache = ReadThroughCache(load_user_summary, app.config['OBJECT_CACHE_SIZE'], app.config['OBJECT_CACHE_TTL'])
+article_cache = ReadThroughCache(load_article_summary, app.config['OBJECT_CACHE_SIZE'], app.config['OBJECT_CACHE_TTL'])
+
+
+# Единый реестр категорий: ключ -> отображаемое имя
+CATEGORY_NAMES = {
+    'general': 'Общее',
+    'technology': 'Технологии',
+    'science': 'Наука',
+    'sports': 'Спорт',
+    'entertainment': 'Развлечения',
+    'politics': 'Политика',
+    'business': 'Бизнес',
+    'health': 'Здоровье'
+}
+VALID_CATEGORIES = tuple(CATEGORY_NAMES)
+
+
 def get_category_name(category):
-    category_names = {
-        'general': 'Общее',
-        'technology': 'Технологии',
-        'science': 'Наука',
-        'sports': 'Спорт',
-        'entertainment': 'Развлечения',
-        'politics': 'Политика',
-        'business': 'Бизнес',
-        'health': 'Здоровье'
+    return CATEGORY_NAMES.get(category, 'Неизвестная категория')
+
+
+def update_stats(category, user_id, articles=0, comments=0, activity=None):
+    """Прибавляет дельты к агрегатам категории и автора в текущей транзакции (без commit)"""
+    for model, key in ((CategoryStats, {'category': category}), (AuthorStats, {'user_id': user_id})):
+        changes = {
+            'articles_count': model.articles_count + articles,
+            'comments_count': model.comments_count + comments
+        }
+        if activity is not None:
+            changes['last_activity'] = activity
+        stmt = sqlite_insert(model).values(articles_count=articles, comments_count=comments,
+                                           last_activity=activity, **key)
+        db.session.execute(stmt.on_conflict_do_update(index_elements=list(key), set_=changes))
+
+
+def rebuild_stats():
+    """Пересчитывает агрегаты с нуля по таблицам статей и комментариев"""
+    comments = db.session.query(
+        Comment.article_id.label('article_id'),
+        func.count(Comment.id).label('comments_count'),
+        func.max(Comment.created_date).label('last_comment')
+    ).group_by(Comment.article_id).subquery()
+
+    CategoryStats.query.delete()
+    AuthorStats.query.delete()
+
+    for model, column, key in ((CategoryStats, Article.category, 'category'),
+                               (AuthorStats, Article.user_id, 'user_id')):
+        rows = db.session.query(
+            column,
+            func.count(Article.id),
+            func.coalesce(func.sum(comments.c.comments_count), 0),
+            func.max(Article.created_date),
+            func.max(comments.c.last_comment)
+        ).outerjoin(comments, comments.c.article_id == Article.id)\
+            .filter(Article.deleted_at.is_(None)).group_by(column).all()
+
+        for value, articles_count, comments_count, last_article, last_comment in rows:
+            db.session.add(model(**{key: value}, articles_count=articles_count,
+                                 comments_count=comments_count,
+                                 last_activity=max(d for d in (last_article, last_comment) if d)))
+
+    db.session.commit()
+
+
+single_flight = SingleFlight(timeout=app.config['SINGLE_FLIGHT_TIMEOUT'])
+
+
+def coalesced(view):
+    """Одновременные одинаковые GET-запросы выполняются один раз и делят готовый ответ"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.path
+        if request.args:
+            key += '?' + urlencode(sorted(request.args.items(multi=True)))
+        
+        def compute():
+            response = make_response(view(*args, **kwargs))
+            return response.get_data(), response.status_code
+        
+        try:
+            body, status = single_flight.do(key, compute)
+        except SingleFlightTimeout:
+            return overload_response(503, 'Сервер перегружен, повторите запрос позже')
+        
+        return app.response_class(body, status=status, mimetype='application/json')
+    return wrapper
+
+
+class ArticleNotFound(LookupError):
+    """Статья удалена (в том числе другим процессом) к моменту записи"""
+
+
+def insert_comment(values):
+    """Добавляет комментарий в текущую транзакцию (без commit) и возвращает его данные.
+
+    Проверка статьи через кэш может устареть, поэтому INSERT ... SELECT вставляет
+    строку, только если статья все еще жива; иначе ArticleNotFound. Категория и
+    автор для агрегатов читаются из строки статьи в той же транзакции.
+    """
+    comments = Comment.__table__
+    articles = Article.__table__
+    created_date = datetime.utcnow()
+    row = select(
+        literal(values['text'], comments.c.text.type),
+        literal(values['author_name'], comments.c.author_name.type),
+        literal(created_date, comments.c.created_date.type),
+        articles.c.id
+    ).where(articles.c.id == values['article_id'], articles.c.deleted_at.is_(None))
+    result = db.session.execute(
+        insert(comments).from_select(['text', 'author_name', 'created_date', 'article_id'], row))
+    if not result.rowcount:
+        raise ArticleNotFound(values['article_id'])
+    category, user_id = db.session.execute(
+        select(articles.c.category, articles.c.user_id).where(articles.c.id == values['article_id'])).one()
+    update_stats(category, user_id, comments=1, activity=created_date)
+    
+    return {
+        'id': result.lastrowid,
+        'text': values['text'],
+        'author_name': values['author_name'],
+        'article_id': values['article_id']
     }
-    return category_names.get(category, 'Неизвестная категория')
+
+
+comment_writer = GroupCommitQueue(
+    app, db, insert_comment,
+    flush_interval=app.config['COMMENT_GROUP_COMMIT_INTERVAL_MS'] / 1000,
+    max_batch=app.config['COMMENT_GROUP_COMMIT_MAX_BATCH']
+)
+
+
+def parse_ids(value):
+    """Разбирает список id вида "1,2,3"; None, если формат неверный или id слишком много"""
+    try:
+        ids = {int(part) for part in value.split(',') if part.strip()}
+    except ValueError:
+        return None
+    if not ids or len(ids) > app.config['MAX_BATCH_IDS']:
+        return None
+    return sorted(ids)
+
+
+def invalid_ids_response(param):
+    return jsonify({
+        'success': False,
+        'error': f'Параметр "{param}" должен содержать от 1 до {app.config["MAX_BATCH_IDS"]} '
+                 f'целых id через запятую'
+    }), 400
+
+
+@app.cli.command('rebuild-stats')
+def rebuild_stats_command():
+    """Пересчитать агрегаты /api/stats (исправление расхождений)"""
+    rebuild_stats()
+    click.echo(f'Категорий: {CategoryStats.query.count()}, авторов: {AuthorStats.query.count()}')
+
+
+def trending_score(views, created_date):
+    """Рейтинг с затуханием по времени, не зависящий от текущего момента, поэтому его можно хранить в индексе"""
+    age_hours = (created_date - datetime(2020, 1, 1)).total_seconds() / 3600
+    return math.log10(max(views, 1)) + age_hours / app.config['TRENDING_DECAY_HOURS']
+
+
+def refresh_trending(article_ids=None):
+    """Пересчитывает Article.trending для указанных статей (или для всех) в текущей транзакции"""
+    articles = Article.__table__
+    query = select(articles.c.id, articles.c.views, articles.c.created_date)
+    if article_ids is not None:
+        query = query.where(articles.c.id.in_(article_ids))
+    rows = [{'b_id': article_id, 'score': trending_score(views, created_date)}
+            for article_id, views, created_date in db.session.execute(query)]
+    if rows:
+        db.session.execute(update(articles).where(articles.c.id == bindparam('b_id'))
+                           .values(trending=bindparam('score')), rows)
+
+
+def apply_view_deltas(deltas):
+    """Прибавляет накопленные просмотры; приращение, а не итог, поэтому безопасно для нескольких процессов"""
+    articles = Article.__table__
+    db.session.execute(update(articles).where(articles.c.id == bindparam('b_id'))
+                       .values(views=articles.c.views + bindparam('delta')),
+                       [{'b_id': article_id, 'delta': delta} for article_id, delta in deltas.items()])
+    refresh_trending(list(deltas))
+
+
+view_counter = ShardedCounter(
+    app, db, apply_view_deltas,
+    shards=app.config['VIEW_COUNTER_SHARDS'],
+    flush_interval=app.config['VIEW_FLUSH_INTERVAL']
+)
+
+
+def counts_views(view):
+    """Засчитывает просмотр каждому успешному запросу, в том числе получившему ответ через coalesced"""
+    @wraps(view)
+    def wrapper(id):
+        response = view(id)
+        if response.status_code == 200:
+            view_counter.hit(id)
+        return response
+    return wrapper
+
+
+def upgrade_schema():
+    """Добавляет в существующую БД новые колонки и индексы моделей (create_all их не добавляет)"""
+    inspector = inspect(db.engine)
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(db.engine.dialect)}'
+                if column.server_default is not None:
+                    ddl += f' DEFAULT {column.server_default.arg}'
+                connection.execute(text(ddl))
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+
+
+def get_live_article(id):
+    """Статья по ID, если она не удалена (в том числе мягко)"""
+    return Article.query.filter_by(id=id, deleted_at=None).first()
+
+
+def deleted_article_ids():
+    return select(Article.id).where(Article.deleted_at.isnot(None))
+
+
+def delete_article_comments(article_id, chunk_size=None):
+    """Удаляет комментарии статьи одним DELETE или, с chunk_size, не более chunk_size строк"""
+    query = Comment.query.filter_by(article_id=article_id)
+    if chunk_size is not None:
+        ids = select(Comment.id).where(Comment.article_id == article_id).limit(chunk_size)
+        query = Comment.query.filter(Comment.id.in_(ids))
+    return query.delete(synchronize_session=False)
+
+
+def configure_sqlite_connection(dbapi_connection, connection_record):
+    """auto_vacuum=INCREMENTAL сразу действует для новой базы, для существующей - после VACUUM
+    (flask enable-auto-vacuum)"""
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        if app.config['SQLITE_WAL'] and cursor.execute('PRAGMA journal_mode').fetchone()[0] != 'wal':
+            cursor.execute('PRAGMA journal_mode=WAL')
+    finally:
+        cursor.close()
 
 
 with app.app_context():
+    if db.engine.dialect.name == 'sqlite':
+        event.listen(db.engine, 'connect', configure_sqlite_connection)
     db.create_all()
+    upgrade_schema()
     
     if not User.query.first():
         test_user = User(name='Первый пользователь', email='tester@dvfu.ru')
@@ -157,59 +588,464 @@ with app.app_context():
         db.session.add(test_user)
         db.session.commit()
 
+    if not CategoryStats.query.first() and Article.query.first():
+        rebuild_stats()
+
+    if Article.query.filter_by(trending=0).first():
+        refresh_trending()
+        db.session.commit()
+
+def database_is_busy(probe_timeout_ms=50):
+    """Пишет ли в базу какой-либо процесс: пробная транзакция записи с коротким ожиданием блокировки"""
+    with app.app_context():
+        if db.engine.dialect.name != 'sqlite':
+            return False
+        connection = db.engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        busy_timeout = cursor.execute('PRAGMA busy_timeout').fetchone()[0]
+        cursor.execute(f'PRAGMA busy_timeout = {int(probe_timeout_ms)}')
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+        except sqlite3.OperationalError:
+            return True
+        finally:
+            cursor.execute(f'PRAGMA busy_timeout = {int(busy_timeout)}')
+        cursor.execute('ROLLBACK')
+        return False
+    finally:
+        connection.close()
+
+
+def traffic_is_busy():
+    """Есть ли живая нагрузка, которой фоновые задачи должны уступить.
+
+    Счетчики допуска видят только запросы своего процесса, поэтому запись из
+    других воркеров (и для процесса flask maintenance --loop) замечается по
+    блокировке базы.
+    """
+    read = admission.limiters['read']
+    if admission.limiters['write'].active > 0 or read.active >= read.limit // 2:
+        return True
+    return database_is_busy()
+
+
+os.makedirs(app.instance_path, exist_ok=True)
+maintenance = MaintenanceScheduler(app, app.instance_path, is_busy=traffic_is_busy)
+
+
+@maintenance.job('purge_refresh_tokens', interval=3600)
+def purge_expired_refresh_tokens(batch_size=500):
+    """Удаляет истекшие refresh-токены пачками, не затирая токены, выданные во время прохода"""
+    users = User.__table__
+    # compare-and-set: строка обновляется, только если токены не менялись с момента чтения
+    stmt = update(users).where(users.c.id == bindparam('user_id'),
+                               users.c.refresh_tokens == bindparam('old_tokens'))\
+        .values(refresh_tokens=bindparam('new_tokens'))
+    purged = 0
+    last_id = 0
+    while True:
+        rows = db.session.query(User.id, User.refresh_tokens)\
+            .filter(User.id > last_id, User.refresh_tokens != '[]')\
+            .order_by(User.id).limit(batch_size).all()
+        if not rows:
+            break
+        
+        changes = []
+        for row in rows:
+            tokens = json.loads(row.refresh_tokens or '[]')
+            alive = [token for token in tokens if JWTManager.verify_refresh_token(token)]
+            if len(alive) != len(tokens):
+                changes.append({'user_id': row.id, 'old_tokens': row.refresh_tokens,
+                                'new_tokens': json.dumps(alive)})
+                purged += len(tokens) - len(alive)
+        if changes:
+            db.session.execute(stmt, changes)
+            db.session.commit()
+        
+        last_id = rows[-1].id
+        if traffic_is_busy():
+            time.sleep(0.05)
+    return f'удалено токенов: {purged}'
+
+
+@maintenance.job('optimize', interval=3600)
+def optimize_database():
+    db.session.execute(text('PRAGMA optimize'))
+    db.session.commit()
+    return 'ok'
+
+
+@maintenance.job('analyze', interval=86400)
+def analyze_database():
+    db.session.execute(text('ANALYZE'))
+    db.session.commit()
+    return 'ok'
+
+
+@maintenance.job('incremental_vacuum', interval=3600)
+def incremental_vacuum(pages=1000, chunk=100):
+    """Возвращает ОС до pages свободных страниц транзакциями по chunk страниц; нужен режим
+    auto_vacuum=INCREMENTAL (для существующей базы его включает flask enable-auto-vacuum)"""
+    connection = db.engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        # freelist_count читает заголовок базы, без этого auto_vacuum может быть устаревшим
+        before = cursor.execute('PRAGMA freelist_count').fetchone()[0]
+        if cursor.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+            return 'пропущено: auto_vacuum не INCREMENTAL, выполните flask enable-auto-vacuum'
+        remaining = min(int(pages), before)
+        while remaining > 0:
+            step = min(chunk, remaining)
+            cursor.execute('BEGIN IMMEDIATE')
+            for _ in range(step):
+                # pysqlite делает только один шаг PRAGMA, а каждый шаг освобождает одну страницу
+                cursor.execute('PRAGMA incremental_vacuum(1)')
+            cursor.execute('COMMIT')
+            remaining -= step
+            if remaining and traffic_is_busy():
+                time.sleep(0.05)
+        after = cursor.execute('PRAGMA freelist_count').fetchone()[0]
+    finally:
+        connection.close()
+    return f'освобождено страниц: {before - after}'
+
+
+@app.cli.command('enable-auto-vacuum')
+@click.confirmation_option(prompt='VACUUM перепишет файл базы и на это время заблокирует запись. Продолжить?')
+def enable_auto_vacuum_command():
+    """Однократно перевести существующую базу в auto_vacuum=INCREMENTAL (полный VACUUM)"""
+    # VACUUM нельзя выполнять внутри транзакции
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        connection.execute(text('PRAGMA freelist_count')).scalar()
+        if connection.execute(text('PRAGMA auto_vacuum')).scalar() == 2:
+            click.echo('auto_vacuum уже INCREMENTAL')
+            return
+        started = time.perf_counter()
+        connection.execute(text('PRAGMA auto_vacuum=INCREMENTAL'))
+        connection.execute(text('VACUUM'))
+    click.echo(f'auto_vacuum=INCREMENTAL включен ({(time.perf_counter() - started) * 1000:.0f} ms)')
+
+
+@maintenance.job('wal_checkpoint', interval=300)
+def wal_checkpoint():
+    """PASSIVE-checkpoint не ждет читателей и писателей"""
+    if db.session.execute(text('PRAGMA journal_mode')).scalar() != 'wal':
+        return 'пропущено: журнал не в режиме WAL'
+    busy, log_pages, checkpointed = db.session.execute(text('PRAGMA wal_checkpoint(PASSIVE)')).one()
+    return f'страниц в WAL: {log_pages}, перенесено: {checkpointed}, busy: {busy}'
+
+
+@maintenance.job('purge_deleted_articles', interval=10)
+def purge_deleted_articles():
+    """Дочищает мягко удаленные статьи: комментарии пачками, каждая в своей короткой транзакции"""
+    chunk_size = app.config['ARTICLE_PURGE_CHUNK']
+    purged_comments = 0
+    longest_chunk_ms = 0.0
+    article_ids = db.session.execute(deleted_article_ids()).scalars().all()
+    for article_id in article_ids:
+        while True:
+            started = time.perf_counter()
+            deleted = delete_article_comments(article_id, chunk_size)
+            db.session.commit()
+            longest_chunk_ms = max(longest_chunk_ms, (time.perf_counter() - started) * 1000)
+            purged_comments += deleted
+            if deleted < chunk_size:
+                break
+            if traffic_is_busy():
+                time.sleep(0.05)
+        Article.query.filter_by(id=article_id).delete(synchronize_session=False)
+        db.session.commit()
+    return (f'статей: {len(article_ids)}, комментариев: {purged_comments}, '
+            f'самая долгая пачка: {longest_chunk_ms:.1f} ms')
+
+
+@app.cli.command('maintenance')
+@click.argument('jobs', nargs=-1)
+@click.option('--loop', is_flag=True, help='Работать постоянно как отдельный процесс-планировщик')
+def maintenance_command(jobs, loop):
+    """Выполнить задачи обслуживания БД (все или перечисленные)"""
+    if loop:
+        maintenance.start()
+        while True:
+            time.sleep(60)
+    
+    for name in jobs or list(maintenance.jobs):
+        if name not in maintenance.jobs:
+            raise click.BadParameter(f'неизвестная задача {name}, доступные: {", ".join(maintenance.jobs)}')
+        result = maintenance.run_job(name, force=True)
+        stats = maintenance.jobs[name].stats
+        if result is None:
+            click.echo(f'{name}: выполняется другим процессом')
+        else:
+            click.echo(f'{name}: {result} ({stats["last_duration_ms"]} ms)')
+
+
+if app.config['MAINTENANCE_SCHEDULER']:
+    maintenance.start()
+elif app.config['ARTICLE_ASYNC_DELETE']:
+    # без дочистки мягко удаленные статьи и их комментарии копились бы бесконечно
+    maintenance.start(['purge_deleted_articles'])
+
+
+def database_path():
+    if db.engine.url.get_backend_name() != 'sqlite' or not db.engine.url.database:
+        raise BackupError('бэкап поддерживается только для файловой базы SQLite')
+    return db.engine.url.database
+
+
+def default_backup_target():
+    backup_dir = app.config['BACKUP_DIR'] or os.path.join(app.instance_path, 'backups')
+    os.makedirs(backup_dir, exist_ok=True)
+    name = os.path.splitext(os.path.basename(database_path()))[0]
+    return os.path.join(backup_dir, f'{name}-{datetime.utcnow():%Y%m%d-%H%M%S}.db.gz')
+
+
+@app.cli.command('backup')
+@click.argument('target', required=False)
+@click.option('--pages', type=int, default=None, help='Страниц за один шаг копирования')
+@click.option('--allow-blocking', is_flag=True,
+              help='Без WAL при постоянной записи копировать одним шагом, блокируя писателей')
+def backup_command(target, pages, allow_blocking):
+    """Снять сжатый снимок базы без остановки сервера"""
+    report = backup_database(database_path(), target or default_backup_target(),
+                             pages=pages or app.config['BACKUP_PAGES'], allow_blocking=allow_blocking,
+                             step_pause=app.config['BACKUP_STEP_PAUSE'])
+    for key, value in report.items():
+        click.echo(f'{key}: {value}')
+
+
+@app.cli.command('restore')
+@click.argument('snapshot', type=click.Path(exists=True, dir_okay=False))
+@click.confirmation_option(prompt='Текущая база будет заменена снимком. Продолжить?')
+def restore_command(snapshot):
+    """Заменить базу снимком; остальные процессы сервера должны быть остановлены"""
+    db.session.remove()
+    db.engine.dispose()
+    report = restore_database(snapshot, database_path())
+    user_cache.clear()
+    article_cache.clear()
+    click.echo(f'База {report["db_path"]} восстановлена из {snapshot} ({report["size_bytes"]} байт)')
+
+
+class BackupRunner:
+    """Не больше одного бэкапа за раз в фоновом потоке; хранит отчет последнего"""
+
+    def __init__(self):
+        self.running = False
+        self.last_report = None
+        self._lock = threading.Lock()
+
+    def start(self, target):
+        with self._lock:
+            if self.running:
+                return False
+            self.running = True
+        threading.Thread(target=self._run, args=(target,), name='backup', daemon=True).start()
+        return True
+
+    def _run(self, target):
+        try:
+            with app.app_context():
+                self.last_report = backup_database(database_path(), target, pages=app.config['BACKUP_PAGES'],
+                                                   step_pause=app.config['BACKUP_STEP_PAUSE'])
+        except Exception as error:
+            app.logger.exception('Бэкап %s завершился с ошибкой', target)
+            self.last_report = {'target': target, 'error': str(error)}
+        finally:
+            self.running = False
+
+
+backup_runner = BackupRunner()
+
+# Строки списков: только нужные колонки, без ORM-объектов и identity map
+ArticleRow = namedtuple('ArticleRow', 'id title text category created_date user_id')
+CommentRow = namedtuple('CommentRow', 'id text author_name created_date article_id')
+
+ARTICLE_SORTS = {
+    'date': Article.created_date.desc(),
+    'date_asc': Article.created_date.asc(),
+    'title': Article.title.asc(),
+    'popular': Article.views.desc(),
+    'trending': Article.trending.desc()
+}
+
+
+@lru_cache(maxsize=None)
+def article_list_statement(sort_by, by_category, by_ids, limited):
+    """Core select для формы запроса; строится один раз, SQLAlchemy берет компиляцию из кэша"""
+    articles = Article.__table__
+    stmt = select(articles.c.id, articles.c.title, articles.c.text, articles.c.category,
+                  articles.c.created_date, articles.c.user_id).where(articles.c.deleted_at.is_(None))
+    if by_category:
+        stmt = stmt.where(articles.c.category == bindparam('category'))
+    if by_ids:
+        stmt = stmt.where(articles.c.id.in_(bindparam('ids', expanding=True)))
+    stmt = stmt.order_by(ARTICLE_SORTS[sort_by])
+    if limited:
+        stmt = stmt.limit(bindparam('limit'))
+    return stmt
+
+
+@lru_cache(maxsize=None)
+def comment_list_statement(by_article, by_article_ids):
+    comments = Comment.__table__
+    stmt = select(comments.c.id, comments.c.text, comments.c.author_name,
+                  comments.c.created_date, comments.c.article_id)\
+        .where(comments.c.article_id.notin_(deleted_article_ids()))
+    if by_article:
+        stmt = stmt.where(comments.c.article_id == bindparam('article_id'))
+    if by_article_ids:
+        stmt = stmt.where(comments.c.article_id.in_(bindparam('article_ids', expanding=True)))
+    return stmt.order_by(comments.c.created_date.desc())
+
+
+COMMENT_COUNTS = select(Comment.__table__.c.article_id, func.count())\
+    .where(Comment.__table__.c.article_id.in_(bindparam('ids', expanding=True)))\
+    .group_by(Comment.__table__.c.article_id)
+
+
+def fetch_articles(sort_by='date', category=None, ids=None, limit=None):
+    stmt = article_list_statement(sort_by, category is not None, ids is not None, limit is not None)
+    params = {'category': category, 'ids': ids, 'limit': limit}
+    return [ArticleRow._make(row) for row in db.session.execute(
+        stmt, {key: value for key, value in params.items() if value is not None})]
+
+
+def fetch_comments(article_id=None, article_ids=None):
+    stmt = comment_list_statement(article_id is not None, article_ids is not None)
+    params = {'article_id': article_id, 'article_ids': article_ids}
+    return [CommentRow._make(row) for row in db.session.execute(
+        stmt, {key: value for key, value in params.items() if value is not None})]
+
+
+def serialize_article_item(article, comments_count):
+    """Элемент списка /api/articles"""
+    author = user_cache.get(article.user_id)
+    return {
+        'id': article.id,
+        'title': article.title,
+        'text': article.text[:200] + '...' if len(article.text) > 200 else article.text,
+        'category': article.category,
+        'category_name': get_category_name(article.category),
+        'created_date': article.created_date.isoformat(),
+        'author': {
+            'id': author.id,
+            'name': author.name
+        },
+        'comments_count': comments_count
+    }
+
+
+def serialize_category_item(article):
+    """Элемент списка /api/articles/category/<category>"""
+    return {
+        'id': article.id,
+        'title': article.title,
+        'text': article.text[:150] + '...',
+        'category': article.category,
+        'created_date': article.created_date.isoformat(),
+        'author_name': user_cache.get(article.user_id).name
+    }
+
+
+def count_comments(article_ids):
+    if not article_ids:
+        return {}
+    return dict(db.session.execute(COMMENT_COUNTS, {'ids': article_ids}).all())
+
+
+def load_feed_ids(category, limit):
+    query = db.session.query(Article.id).filter(Article.deleted_at.is_(None))
+    if category:
+        query = query.filter(Article.category == category)
+    return [row.id for row in query.order_by(Article.created_date.desc()).limit(limit)]
+
+
+def render_feed_items(article_ids):
+    articles = fetch_articles(ids=article_ids)
+    comments = count_comments(article_ids)
+    return {
+        article.id: {
+            'list': app.json.dumps(serialize_article_item(article, comments.get(article.id, 0))).encode('utf-8'),
+            'category': app.json.dumps(serialize_category_item(article)).encode('utf-8')
+        }
+        for article in articles
+    }
+
+
+def feed_fingerprint():
+    """Меняется при любой записи, влияющей на ленты, в любом процессе (агрегаты из /api/stats)"""
+    rows = db.session.query(CategoryStats).order_by(CategoryStats.category).all()
+    return [f'{row.category}:{row.articles_count}:{row.comments_count}:{row.last_activity}' for row in rows]
+
+
+feeds = FeedSnapshots(
+    load_feed_ids, render_feed_items, feed_fingerprint,
+    size=app.config['FEED_SNAPSHOT_SIZE'],
+    check_interval=app.config['FEED_SNAPSHOT_CHECK_INTERVAL'],
+    path=app.config['FEED_SNAPSHOT_PATH']
+)
+
+
+def feed_response(fragments, envelope):
+    """Собирает JSON-ответ из готовых элементов без повторной сериализации"""
+    head = app.json.dumps(envelope)[:-1].encode('utf-8')
+    body = head + b',"articles":[' + b','.join(fragments) + b']}\n'
+    return app.response_class(body, mimetype='application/json')
+
+
 # API МАРШРУТЫ
 @app.route('/api/articles', methods=['GET'])
+@coalesced
 def api_get_articles():
     """GET /api/articles список всех статей с фильтрацией и сортировкой"""
     
     category = request.args.get('category')
     sort_by = request.args.get('sort', 'date')  
     limit = request.args.get('limit', type=int)  
+    ids = request.args.get('ids')
+    
+    if (ids is None and sort_by == 'date' and limit and 0 < limit <= feeds.size
+            and (not category or category in VALID_CATEGORIES)):
+        _, items = feeds.get(category or None)
+        fragments = [item['list'] for item in items[:limit]]
+        return feed_response(fragments, {
+            'success': True,
+            'count': len(fragments),
+            'filters': {
+                'category': category if category else 'all',
+                'sort_by': sort_by,
+                'limit': limit,
+                'ids': 'all'
+            }
+        })
     
-    query = Article.query
+    article_ids = None
+    if ids is not None:
+        article_ids = parse_ids(ids)
+        if article_ids is None:
+            return invalid_ids_response('ids')
     
-    if category:
-        valid_categories = ['general', 'technology', 'science', 'sports', 'entertainment', 'politics', 'business', 'health']
-        if category in valid_categories:
-            query = query.filter_by(category=category)
-        else:
-            return jsonify({
-                'success': False,
-                'error': f'Категория "{category}" не найдена. Доступные: {", ".join(valid_categories)}'
-            }), 400
-    
-    if sort_by == 'date':
-        query = query.order_by(Article.created_date.desc())  
-    elif sort_by == 'date_asc':
-        query = query.order_by(Article.created_date.asc())   
-    elif sort_by == 'title':
-        query = query.order_by(Article.title.asc())          
-    else:
+    if category and category not in VALID_CATEGORIES:
         return jsonify({
             'success': False,
-            'error': f'Неправильный параметр сортировки. Доступные: date, date_asc, title'
+            'error': f'Категория "{category}" не найдена. Доступные: {", ".join(VALID_CATEGORIES)}'
         }), 400
     
-    if limit and limit > 0:
-        query = query.limit(limit)
+    if sort_by not in ARTICLE_SORTS:
+        return jsonify({
+            'success': False,
+            'error': f'Неправильный параметр сортировки. Доступные: {", ".join(ARTICLE_SORTS)}'
+        }), 400
     
-    articles = query.all()
+    articles = fetch_articles(sort_by, category or None, article_ids,
+                              limit if limit and limit > 0 else None)
+    comments = count_comments([article.id for article in articles])
     
     articles_list = []
     for article in articles:
-        articles_list.append({
-            'id': article.id,
-            'title': article.title,
-            'text': article.text[:200] + '...' if len(article.text) > 200 else article.text,
-            'category': article.category,
-            'category_name': get_category_name(article.category),
-            'created_date': article.created_date.isoformat(),
-            'author': {
-                'id': article.author.id,
-                'name': article.author.name
-            },
-            'comments_count': len(article.comments)
-        })
+        articles_list.append(serialize_article_item(article, comments.get(article.id, 0)))
     
     return jsonify({
         'success': True,
@@ -217,29 +1053,34 @@ def api_get_articles():
         'filters': {
             'category': category if category else 'all',
             'sort_by': sort_by,
-            'limit': limit if limit else 'none'
+            'limit': limit if limit else 'none',
+            'ids': article_ids if article_ids else 'all'
         },
         'articles': articles_list
     })
 
 
 @app.route('/api/articles/<int:id>', methods=['GET'])
+@counts_views
+@coalesced
 def api_get_article(id):
-    article = Article.query.get(id)
+    article = get_live_article(id)
     
     if not article:
         abort(404, description=f"Статья с ID {id} не найдена")
     
+    author = user_cache.get(article.user_id)
     article_data = {
         'id': article.id,
         'title': article.title,
         'text': article.text,
         'category': article.category,
         'created_date': article.created_date.isoformat(),
+        'views': article.views,
         'author': {
-            'id': article.author.id,
-            'name': article.author.name,
-            'email': article.author.email
+            'id': author.id,
+            'name': author.name,
+            'email': author.email
         },
         'comments': [
             {
@@ -284,9 +1125,7 @@ def api_create_article():
         errors.append('Текст должен содержать минимум 10 символов')
     
     category = data.get('category', 'general')
-    valid_categories = ['general', 'technology', 'science', 'sports', 
-                       'entertainment', 'politics', 'business', 'health']
-    if category not in valid_categories:
+    if category not in VALID_CATEGORIES:
         category = 'general'
     
     if errors:
@@ -302,7 +1141,7 @@ def api_create_article():
             'error': 'Пользователь не авторизован'
         }), 401
 
-    user = User.query.get(user_id)
+    user = user_cache.get(user_id)
     if not user:
         return jsonify({
             'success': False,
@@ -317,7 +1156,11 @@ def api_create_article():
     )
     
     db.session.add(new_article)
+    db.session.flush()
+    new_article.trending = trending_score(0, new_article.created_date)
+    update_stats(new_article.category, user.id, articles=1, activity=new_article.created_date)
     db.session.commit()
+    feeds.article_changed(new_article.id, category)
     
     return jsonify({
         'success': True,
@@ -336,7 +1179,7 @@ def api_create_article():
 def api_update_article(id):
     """PUT /api/articles/<id> обновить статью через API"""
     
-    article = Article.query.get(id)
+    article = get_live_article(id)
     if not article:
         return jsonify({
             'success': False,
@@ -352,6 +1195,7 @@ def api_update_article(id):
     data = request.get_json()
     
     errors = []
+    old_category = article.category
     
     if 'title' in data:
         if len(data['title']) < 3:
@@ -366,9 +1210,7 @@ def api_update_article(id):
             article.text = data['text']
     
     if 'category' in data:
-        valid_categories = ['general', 'technology', 'science', 'sports', 
-                           'entertainment', 'politics', 'business', 'health']
-        if data['category'] in valid_categories:
+        if data['category'] in VALID_CATEGORIES:
             article.category = data['category']
         else:
             errors.append('Некорректная категория')
@@ -379,7 +1221,17 @@ def api_update_article(id):
             'errors': errors
         }), 400
     
+    if article.category != old_category:
+        comments_count = Comment.query.filter_by(article_id=article.id).count()
+        update_stats(old_category, article.user_id, articles=-1, comments=-comments_count)
+        update_stats(article.category, article.user_id, articles=1, comments=comments_count)
+    else:
+        # правка тоже активность: меняет отпечаток лент в других процессах
+        update_stats(article.category, article.user_id, activity=datetime.utcnow())
+    
     db.session.commit()
+    article_cache.invalidate(article.id)
+    feeds.article_changed(article.id, old_category, article.category)
     
     return jsonify({
         'success': True,
@@ -397,28 +1249,28 @@ def api_update_article(id):
 def api_get_articles_by_category(category):
     """GET /api/articles/category/<category> фильтр по категории"""
     
-    valid_categories = ['general', 'technology', 'science', 'sports', 'entertainment', 'politics', 'business', 'health']
-    
-    if category not in valid_categories:
+    if category not in VALID_CATEGORIES:
         return jsonify({
             'success': False,
             'error': f'Категория "{category}" не найдена',
-            'available_categories': valid_categories
+            'available_categories': list(VALID_CATEGORIES)
         }), 404
     
-    articles = Article.query.filter_by(category=category)\
-               .order_by(Article.created_date.desc()).all()
+    complete, items = feeds.get(category)
+    if complete:
+        fragments = [item['category'] for item in items]
+        return feed_response(fragments, {
+            'success': True,
+            'category': category,
+            'category_name': get_category_name(category),
+            'count': len(fragments)
+        })
+    
+    articles = fetch_articles(category=category)
     
     articles_list = []
     for article in articles:
-        articles_list.append({
-            'id': article.id,
-            'title': article.title,
-            'text': article.text[:150] + '...',
-            'category': article.category,
-            'created_date': article.created_date.isoformat(),
-            'author_name': article.author.name
-        })
+        articles_list.append(serialize_category_item(article))
     
     return jsonify({
         'success': True,
@@ -433,7 +1285,7 @@ def api_get_articles_by_category(category):
 def api_delete_article(id):
     """DELETE /api/articles/<id> удалить статью через API"""
     
-    article = Article.query.get(id)
+    article = get_live_article(id)
     if not article:
         return jsonify({
             'success': False,
@@ -444,41 +1296,60 @@ def api_delete_article(id):
         'id': article.id,
         'title': article.title
     }
+    category = article.category
     
-    db.session.delete(article)
+    comments_count = Comment.query.filter_by(article_id=article.id).count()
+    update_stats(article.category, article.user_id, articles=-1, comments=-comments_count)
+    
+    if app.config['ARTICLE_ASYNC_DELETE']:
+        # статья сразу скрыта, комментарии дочистит задача purge_deleted_articles
+        article.deleted_at = datetime.utcnow()
+        purge = 'background'
+    else:
+        delete_article_comments(article.id)
+        Article.query.filter_by(id=article.id).delete(synchronize_session=False)
+        purge = 'done'
     db.session.commit()
+    article_cache.invalidate(id)
+    feeds.article_changed(id, category)
     
     return jsonify({
         'success': True,
         'message': 'Статья успешно удалена',
-        'deleted_article': article_data
+        'deleted_article': article_data,
+        'comments_purge': purge
     })
     
 @app.route('/api/comments', methods=['GET'])
+@coalesced
 def api_get_comments():
     """GET /api/comments список всех комментариев"""
     
     article_id = request.args.get('article_id', type=int)
+    ids = request.args.get('article_ids')
     
-    query = Comment.query
-    
-    if article_id:
-        query = query.filter_by(article_id=article_id)
+    article_ids = None
+    if ids is not None:
+        article_ids = parse_ids(ids)
+        if article_ids is None:
+            return invalid_ids_response('article_ids')
     
-    query = query.order_by(Comment.created_date.desc())
-    
-    comments = query.all()
+    comments = fetch_comments(article_id or None, article_ids)
     
     comments_list = []
     for comment in comments:
+        article = article_cache.get(comment.article_id)
+        if not article:
+            # статью удалили после выборки или комментарий остался без статьи
+            continue
         comments_list.append({
             'id': comment.id,
             'text': comment.text,
             'author_name': comment.author_name,
             'created_date': comment.created_date.isoformat(),
             'article': {
-                'id': comment.article.id,
-                'title': comment.article.title[:50] + '...'
+                'id': article.id,
+                'title': article.title[:50] + '...'
             }
         })
     
@@ -486,7 +1357,8 @@ def api_get_comments():
         'success': True,
         'count': len(comments_list),
         'filters': {
-            'article_id': article_id if article_id else 'all'
+            'article_id': article_id if article_id else 'all',
+            'article_ids': article_ids if article_ids else 'all'
         },
         'comments': comments_list
     })
@@ -503,15 +1375,22 @@ def api_get_comment(id):
             'error': f'Комментарий с ID {id} не найден'
         }), 404
     
+    article = article_cache.get(comment.article_id)
+    if not article:
+        return jsonify({
+            'success': False,
+            'error': f'Комментарий с ID {id} не найден'
+        }), 404
+    
     comment_data = {
         'id': comment.id,
         'text': comment.text,
         'author_name': comment.author_name,
         'created_date': comment.created_date.isoformat(),
         'article': {
-            'id': comment.article.id,
-            'title': comment.article.title,
-            'author': comment.article.author.name
+            'id': article.id,
+            'title': article.title,
+            'author': user_cache.get(article.user_id).name
         }
     }
     
@@ -521,6 +1400,14 @@ def api_get_comment(id):
     })
     
     
+def article_gone_response(article_id):
+    article_cache.invalidate(article_id)
+    return jsonify({
+        'success': False,
+        'errors': [f'Статья с ID {article_id} не найдена']
+    }), 400
+
+
 @app.route('/api/comments', methods=['POST'])
 @jwt_required
 def api_create_comment():
@@ -551,7 +1438,7 @@ def api_create_comment():
     if not data.get('article_id'):
         errors.append('Поле "article_id" обязательно')
     else:
-        article = Article.query.get(data['article_id'])
+        article = article_cache.get(data['article_id'])
         if not article:
             errors.append(f'Статья с ID {data["article_id"]} не найдена')
     
@@ -561,24 +1448,49 @@ def api_create_comment():
             'errors': errors
         }), 400
     
-    new_comment = Comment(
-        text=data['text'],
-        author_name=data['author_name'],
-        article_id=data['article_id']
-    )
+    values = {
+        'text': data['text'],
+        'author_name': data['author_name'],
+        'article_id': data['article_id']
+    }
     
-    db.session.add(new_comment)
-    db.session.commit()
+    if app.config['COMMENT_GROUP_COMMIT']:
+        # пока запрос ждет commit пачки, ему не нужны ни соединение из пула, ни слот
+        # записи: иначе лимит write ограничивал бы размер пачки
+        db.session.close()
+        ticket = getattr(request, 'admission_ticket', None)
+        if ticket:
+            ticket.release()
+        future = comment_writer.submit(values)
+        try:
+            try:
+                comment_data = future.result(timeout=app.config['COMMENT_GROUP_COMMIT_TIMEOUT'])
+            except FutureTimeoutError:
+                # запись еще в очереди: отменяем, чтобы повтор клиента не создал дубликат
+                if future.cancel():
+                    return overload_response(503, 'Сервер перегружен, повторите запрос позже')
+                # пачка уже пишется, отменить нельзя: дожидаемся ее итога
+                comment_data = future.result()
+        except ArticleNotFound:
+            return article_gone_response(values['article_id'])
+        except Exception:
+            return jsonify({
+                'success': False,
+                'error': 'Не удалось сохранить комментарий'
+            }), 500
+    else:
+        try:
+            comment_data = insert_comment(values)
+        except ArticleNotFound:
+            db.session.rollback()
+            return article_gone_response(values['article_id'])
+        db.session.commit()
+    feeds.comments_changed(comment_data['article_id'])
     
     return jsonify({
         'success': True,
         'message': 'Комментарий успешно создан',
-        'comment': {
-            'id': new_comment.id,
-            'text': new_comment.text,
-            'author_name': new_comment.author_name,
-            'article_id': new_comment.article_id
-        }
+        'comment': comment_data
     }), 201
     
 @app.route('/api/comments/<int:id>', methods=['PUT'])
@@ -655,9 +1567,24 @@ def api_delete_comment(id):
         'text': comment.text[:50] + '...',
         'author_name': comment.author_name
     }
+    article_id = comment.article_id
     
     db.session.delete(comment)
+    db.session.flush()
+    # строка статьи читается после DELETE, т.е. под блокировкой записи: категория и автор
+    # для агрегатов не могут устареть, как в кэше
+    article = db.session.query(Article.category, Article.user_id)\
+        .filter_by(id=article_id, deleted_at=None).first()
+    if not article:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': f'Комментарий с ID {id} не найден'
+        }), 404
+    
+    update_stats(article.category, article.user_id, comments=-1)
     db.session.commit()
+    feeds.comments_changed(article_id)
     
     return jsonify({
         'success': True,
@@ -666,6 +1593,181 @@ def api_delete_comment(id):
     })
     
     
+@app.route('/api/stats', methods=['GET'])
+def api_get_stats():
+    """GET /api/stats счетчики статей и комментариев по категориям и авторам"""
+    
+    category_stats = {row.category: row for row in CategoryStats.query.all()}
+    
+    categories = []
+    for category in VALID_CATEGORIES:
+        row = category_stats.get(category)
+        categories.append({
+            'category': category,
+            'category_name': get_category_name(category),
+            'articles_count': row.articles_count if row else 0,
+            'comments_count': row.comments_count if row else 0,
+            'last_activity': row.last_activity.isoformat() if row and row.last_activity else None
+        })
+    
+    authors = []
+    for row in AuthorStats.query.order_by(AuthorStats.articles_count.desc()).all():
+        author = user_cache.get(row.user_id)
+        if not author:
+            continue
+        authors.append({
+            'id': row.user_id,
+            'name': author.name,
+            'articles_count': row.articles_count,
+            'comments_count': row.comments_count,
+            'last_activity': row.last_activity.isoformat() if row.last_activity else None
+        })
+    
+    return jsonify({
+        'success': True,
+        'categories': categories,
+        'authors': authors
+    })
+
+
+@app.route('/api/batch', methods=['POST'])
+def api_batch():
+    """POST /api/batch несколько GET-запросов чтения за один HTTP-вызов"""
+    
+    if not request.is_json:
+        return jsonify({
+            'success': False,
+            'error': 'Content-Type должен быть application/json'
+        }), 400
+    
+    data = request.get_json()
+    sub_requests = data.get('requests') if isinstance(data, dict) else None
+    if not isinstance(sub_requests, list) or not sub_requests:
+        return jsonify({
+            'success': False,
+            'error': 'Поле "requests" должно быть непустым списком'
+        }), 400
+    
+    if len(sub_requests) > app.config['MAX_BATCH_REQUESTS']:
+        return jsonify({
+            'success': False,
+            'error': f'Не более {app.config["MAX_BATCH_REQUESTS"]} подзапросов за раз'
+        }), 400
+    
+    rate_identity = getattr(request, 'rate_identity', None)
+    if rate_identity and len(sub_requests) > 1:
+        # каждый подзапрос стоит токен, как отдельный запрос; один уже списан при допуске
+        retry_after = admission.check_rate(*rate_identity, cost=len(sub_requests) - 1)
+        if retry_after:
+            return overload_response(429, 'Слишком много запросов', retry_after)
+    
+    responses = []
+    for sub_request in sub_requests:
+        path = sub_request.get('path', '') if isinstance(sub_request, dict) else ''
+        responses.append(dispatch_batch_request(path))
+    
+    return jsonify({
+        'success': True,
+        'count': len(responses),
+        'responses': responses
+    })
+
+
+def dispatch_batch_request(path):
+    """Выполняет подзапрос в текущем контексте приложения, т.е. в той же сессии БД"""
+    if not (path.startswith('/api/articles') or path.startswith('/api/comments')
+            or path == '/api/stats'):
+        return {
+            'path': path,
+            'status': 400,
+            'body': {'success': False, 'error': 'Разрешены только маршруты чтения статей, комментариев и статистики'}
+        }
+    
+    # Контекст приложения уже активен, поэтому подзапрос использует ту же db.session
+    with app.test_request_context(path, method='GET'):
+        try:
+            if request.routing_exception is not None:
+                raise request.routing_exception
+            response = app.make_response(app.dispatch_request())
+        except HTTPException as error:
+            return {
+                'path': path,
+                'status': error.code,
+                'body': {'success': False, 'error': error.description}
+            }
+        return {
+            'path': path,
+            'status': response.status_code,
+            'body': response.get_json()
+        }
+
+
+def admin_required(view):
+    """Пускает только авторизованных пользователей с email из ADMIN_EMAILS"""
+    @wraps(view)
+    @jwt_required
+    def wrapper(*args, **kwargs):
+        user = user_cache.get(request.user_id)
+        if not user or user.email not in app.config['ADMIN_EMAILS']:
+            return jsonify({
+                'success': False,
+                'error': 'Требуются права администратора'
+            }), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+
+@app.route('/api/admin/backup', methods=['POST'])
+@admin_required
+def api_admin_backup():
+    """POST /api/admin/backup запустить онлайн-бэкап в фоне"""
+    try:
+        target = default_backup_target()
+    except BackupError as error:
+        return jsonify({'success': False, 'error': str(error)}), 400
+    
+    if not backup_runner.start(target):
+        return jsonify({
+            'success': False,
+            'error': 'Бэкап уже выполняется'
+        }), 409
+    
+    return jsonify({
+        'success': True,
+        'message': 'Бэкап запущен',
+        'target': target
+    }), 202
+
+
+@app.route('/api/admin/backup', methods=['GET'])
+@admin_required
+def api_admin_backup_status():
+    """GET /api/admin/backup состояние и отчет последнего бэкапа"""
+    return jsonify({
+        'success': True,
+        'running': backup_runner.running,
+        'last_report': backup_runner.last_report
+    })
+
+
+@app.route('/api/metrics', methods=['GET'])
+def api_get_metrics():
+    """GET /api/metrics внутренние метрики сервера"""
+    return jsonify({
+        'success': True,
+        'single_flight': single_flight.stats(),
+        'admission': admission.stats(),
+        'comment_group_commit': comment_writer.stats(),
+        'object_cache': {
+            'users': user_cache.stats(),
+            'articles': article_cache.stats()
+        },
+        'maintenance': maintenance.stats(),
+        'feeds': feeds.stats(),
+        'views': view_counter.stats()
+    })
+
+
 @app.route('/auth/login', methods=['POST'])
 def auth_login():
     if not request.is_json:
@@ -864,14 +1966,24 @@ def api_root():
                 'create': '/api/articles (POST)',
                 'update': '/api/articles/<id> (PUT)',
                 'delete': '/api/articles/<id> (DELETE)',
-                'by_category': '/api/articles/category/<category> (GET)'
+                'by_category': '/api/articles/category/<category> (GET)',
+                'by_ids': '/api/articles?ids=1,2,3 (GET)',
+                'popular': '/api/articles?sort=popular (GET)',
+                'trending': '/api/articles?sort=trending (GET)'
             },
             'comments': {
                 'list': '/api/comments (GET)',
                 'get': '/api/comments/<id> (GET)',
                 'create': '/api/comments (POST)',
                 'update': '/api/comments/<id> (PUT)',
-                'delete': '/api/comments/<id> (DELETE)'
+                'delete': '/api/comments/<id> (DELETE)',
+                'by_articles': '/api/comments?article_ids=1,2,3 (GET)'
+            },
+            'stats': '/api/stats (GET)',
+            'batch': '/api/batch (POST)',
+            'admin': {
+                'backup': '/api/admin/backup (POST)',
+                'backup_status': '/api/admin/backup (GET)'
             }
         }
     })
@@ -0,0 +1,181 @@
+"""ASGI-точка входа для News API.
+
+Отдает те же маршруты и тот же JSON, что и app.py: каждый запрос
+обрабатывается Flask-приложением, но соединение держит event loop,
+а не отдельный поток. Поток из пула занят только на время выполнения
+обработчика, поэтому медленные клиенты и долгие запросы не блокируют
+воркеры. Чтение (GET/HEAD/OPTIONS) и запись выполняются в разных пулах,
+чтобы хеширование паролей и каскадные удаления не отнимали потоки у чтения.
+
+Лимиты конкурентности контроля допуска проверяются здесь, до постановки в
+пул: очередь пула не растет сверх лимита класса, запрос сверх него сразу
+получает 503, а время ожидания потока входит в задержку, по которой
+адаптивный режим ужимает auth и write.
+
+Запуск:
+    uvicorn asgi:application --host 0.0.0.0 --port 5000
+"""
+import asyncio
+import io
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from admission import AdmissionController
+from app import app, admission
+
+READ_WORKERS = int(os.environ.get('ASGI_READ_WORKERS', 16))
+# при групповом commit поток записи ждет commit пачки комментариев, и размер пула
+# ограничивает размер пачки (слот контроля допуска на время ожидания освобождается)
+WRITE_WORKERS = int(os.environ.get('ASGI_WRITE_WORKERS', 32 if app.config['COMMENT_GROUP_COMMIT'] else 4))
+MAX_BODY_SIZE = int(os.environ.get('ASGI_MAX_BODY_SIZE', 1024 * 1024))
+
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+OVERLOAD_HEADERS = [(b'content-type', b'application/json'), (b'retry-after', b'1')]
+OVERLOAD_BODY = json.dumps({'success': False, 'error': 'Сервер перегружен, повторите запрос позже'},
+                           ensure_ascii=False).encode('utf-8')
+
+
+class ClientDisconnected(Exception):
+    """Клиент закрыл соединение, не дослав тело запроса"""
+
+
+class AsyncApp:
+    """Адаптер WSGI -> ASGI с раздельными пулами потоков для чтения и записи"""
+
+    def __init__(self, wsgi_app, read_workers=READ_WORKERS, write_workers=WRITE_WORKERS, admission=None):
+        self.wsgi_app = wsgi_app
+        self.admission = admission
+        self.read_pool = ThreadPoolExecutor(read_workers, thread_name_prefix='asgi-read')
+        self.write_pool = ThreadPoolExecutor(write_workers, thread_name_prefix='asgi-write')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise RuntimeError(f'Неподдерживаемый тип соединения: {scope["type"]}')
+
+        try:
+            body = await self.read_body(receive)
+        except ClientDisconnected:
+            # обрезанный запрос не передается во Flask: запись из него была бы неполной
+            return
+        if body is None:
+            await self.send_response(send, 413, [(b'content-type', b'application/json')],
+                                     [b'{"success": false, "error": "Request body too large"}'])
+            return
+
+        ticket = None
+        if self.admission is not None and scope['method'] != 'OPTIONS':
+            route_class = self.admission.classify(scope['method'], scope['path'])
+            # ждать слот в event loop нельзя: он либо свободен сейчас, либо 503
+            ticket = self.admission.acquire(route_class, timeout=0)
+            if ticket is None:
+                await self.send_response(send, 503, OVERLOAD_HEADERS, [OVERLOAD_BODY])
+                return
+
+        environ = self.build_environ(scope, body)
+        if ticket is not None:
+            environ['news_api.admission_ticket'] = ticket
+        # POST /api/batch только читает, как и в классификации контроля допуска
+        is_read = scope['method'] in READ_METHODS or scope['path'] in AdmissionController.read_only_paths
+        pool = self.read_pool if is_read else self.write_pool
+        loop = asyncio.get_running_loop()
+        try:
+            status, headers, chunks = await loop.run_in_executor(pool, self.call_wsgi, environ)
+        finally:
+            if ticket is not None:
+                ticket.release()
+        await self.send_response(send, status, headers, chunks)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                # ожидание незавершенных обработчиков не должно блокировать event loop
+                await asyncio.to_thread(self.shutdown_pools)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def shutdown_pools(self):
+        self.read_pool.shutdown(wait=True)
+        self.write_pool.shutdown(wait=True)
+
+    async def read_body(self, receive):
+        """Читает тело запроса целиком, не занимая поток; None если тело слишком большое"""
+        body = bytearray()
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                raise ClientDisconnected()
+            body.extend(message.get('body', b''))
+            if len(body) > MAX_BODY_SIZE:
+                return None
+            more_body = message.get('more_body', False)
+        return bytes(body)
+
+    @staticmethod
+    def build_environ(scope, body):
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': str(server[0]),
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+            'REMOTE_ADDR': client[0],
+            'REMOTE_PORT': str(client[1]),
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        for raw_name, raw_value in scope.get('headers', []):
+            name = raw_name.decode('latin-1').upper().replace('-', '_')
+            value = raw_value.decode('latin-1')
+            if name == 'CONTENT_TYPE':
+                environ['CONTENT_TYPE'] = value
+                continue
+            if name == 'CONTENT_LENGTH':
+                continue
+            key = f'HTTP_{name}'
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+        return environ
+
+    def call_wsgi(self, environ):
+        """Выполняется в пуле потоков: вызывает Flask и собирает ответ целиком"""
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                   for name, value in headers]
+
+        result = self.wsgi_app(environ, start_response)
+        try:
+            chunks = [chunk for chunk in result if chunk]
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return response['status'], response['headers'], chunks
+
+    @staticmethod
+    async def send_response(send, status, headers, chunks):
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': b''.join(chunks)})
+
+
+application = AsyncApp(app, admission=admission if app.config['ADMISSION_ENABLED'] else None)
@@ -0,0 +1,179 @@
+"""Онлайн-бэкап и восстановление SQLite без остановки сервера.
+
+Снимок снимается штатным backup API SQLite порциями по pages страниц.
+В режиме WAL все шаги идут внутри одной транзакции чтения: снимок
+согласован на момент ее начала, а писатели продолжают работать и не ждут
+вовсе. В режиме rollback-журнала транзакция чтения блокировала бы писателей
+на все время копирования, поэтому блокировка берется только на время шага;
+если база за это время изменилась, SQLite начинает копирование заново, и
+после max_restarts перезапусков бэкап прерывается с советом включить WAL
+(приложение включает его по умолчанию). С allow_blocking=True вместо этого
+база копируется одним шагом: бэкап завершится, но писатели ждут все время
+копирования, на большой базе это секунды и минуты.
+
+Снимок пишется во временный файл рядом с целью и проверяется через
+PRAGMA integrity_check. Затем он потоково сжимается gzip в target.tmp,
+который переименовывается в target только после успешной записи.
+Восстановление распаковывает снимок рядом с базой, проверяет его и
+подменяет файл базы атомарным os.replace.
+"""
+import gzip
+import os
+import shutil
+import sqlite3
+import time
+
+CHUNK_SIZE = 1024 * 1024
+TRUNCATE_STEP = 64 * 1024 * 1024
+
+
+class BackupError(Exception):
+    pass
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+def check_integrity(path):
+    connection = sqlite3.connect(path)
+    try:
+        result = connection.execute('PRAGMA integrity_check').fetchone()[0]
+    finally:
+        connection.close()
+    if result != 'ok':
+        raise BackupError(f'снимок {path} поврежден: {result}')
+
+
+def remove_gradually(path):
+    """Удаляет большой файл, укорачивая его порциями: unlink гигабайтного файла разом
+    задерживает fsync остальных процессов на сотни миллисекунд"""
+    size = os.path.getsize(path)
+    while size > TRUNCATE_STEP:
+        size -= TRUNCATE_STEP
+        os.truncate(path, size)
+    os.remove(path)
+
+
+def _open_destination(raw_path):
+    if os.path.exists(raw_path):
+        remove_gradually(raw_path)
+    destination = sqlite3.connect(raw_path)
+    # временный файл проверяется integrity_check после копирования: fsync и журнал на каждом
+    # шаге не нужны и только отнимают диск у писателей базы
+    destination.execute('PRAGMA synchronous=OFF')
+    destination.execute('PRAGMA journal_mode=OFF')
+    return destination
+
+
+def backup_database(db_path, target, pages=256, max_restarts=10, progress=None, allow_blocking=False,
+                    step_pause=0.0):
+    """Снимает сжатый снимок базы db_path в target; возвращает отчет со скоростью и самым долгим шагом.
+
+    step_pause - пауза после каждого шага: копирование медленнее, но меньше отнимает
+    диск у писателей.
+    """
+    raw_path = f'{target}.raw'
+    steps = []
+    state = {'last': time.perf_counter(), 'remaining': None, 'restarts': 0}
+
+    def on_step(status, remaining, total):
+        now = time.perf_counter()
+        steps.append(now - state['last'])
+        state['last'] = now
+        if state['remaining'] is not None and remaining > state['remaining']:
+            state['restarts'] += 1
+            if state['restarts'] > max_restarts:
+                raise _TooManyRestarts()
+        state['remaining'] = remaining
+        if progress:
+            progress(total - remaining, total)
+        if step_pause and remaining:
+            time.sleep(step_pause)
+            state['last'] = time.perf_counter()
+
+    started = time.perf_counter()
+    source = sqlite3.connect(db_path, isolation_level=None)
+    destination = _open_destination(raw_path)
+    try:
+        try:
+            journal_mode = source.execute('PRAGMA journal_mode').fetchone()[0]
+            if journal_mode == 'wal':
+                source.execute('BEGIN')
+                source.execute('SELECT count(*) FROM sqlite_master').fetchone()
+            page_size = source.execute('PRAGMA page_size').fetchone()[0]
+            try:
+                source.backup(destination, pages=pages, progress=on_step)
+                mode = 'incremental'
+            except _TooManyRestarts:
+                if not allow_blocking:
+                    raise BackupError(f'база меняется быстрее, чем копируется ({max_restarts} перезапусков); '
+                                      f'включите PRAGMA journal_mode=WAL')
+                # явно разрешено: копируем одним шагом, писатели ждут до конца копирования;
+                # без журнала прерванная копия не откатывается, поэтому начинаем с чистого файла
+                destination.close()
+                destination = _open_destination(raw_path)
+                state['last'] = time.perf_counter()
+                source.backup(destination, pages=-1, progress=on_step)
+                mode = 'one_step'
+        finally:
+            destination.close()
+            source.close()
+    except Exception:
+        if os.path.exists(raw_path):
+            remove_gradually(raw_path)
+        raise
+    copied_at = time.perf_counter()
+
+    try:
+        check_integrity(raw_path)
+        size = os.path.getsize(raw_path)
+        with open(raw_path, 'rb') as raw, gzip.open(f'{target}.tmp', 'wb', compresslevel=6) as packed:
+            shutil.copyfileobj(raw, packed, CHUNK_SIZE)
+        os.replace(f'{target}.tmp', target)
+    finally:
+        for path in (raw_path, f'{target}.tmp'):
+            if os.path.exists(path):
+                remove_gradually(path)
+    finished = time.perf_counter()
+
+    return {
+        'target': target,
+        'size_bytes': size,
+        'compressed_bytes': os.path.getsize(target),
+        'pages': size // page_size,
+        'journal_mode': journal_mode,
+        'mode': mode,
+        'steps': len(steps),
+        'restarts': state['restarts'],
+        'copy_ms': round((copied_at - started) * 1000, 1),
+        'total_ms': round((finished - started) * 1000, 1),
+        'throughput_mb_s': round(size / 1024 / 1024 / max(copied_at - started, 1e-9), 1),
+        'longest_step_ms': round(max(steps, default=0) * 1000, 2),
+        'integrity': 'ok'
+    }
+
+
+def restore_database(snapshot, db_path):
+    """Подменяет базу db_path снимком snapshot; соединения с базой должны быть закрыты"""
+    restore_path = f'{db_path}.restore'
+    try:
+        with gzip.open(snapshot, 'rb') as packed, open(restore_path, 'wb') as raw:
+            shutil.copyfileobj(packed, raw, CHUNK_SIZE)
+        check_integrity(restore_path)
+
+        # незачекпойнченный WAL старой базы нельзя применять к новому файлу
+        connection = sqlite3.connect(db_path)
+        try:
+            connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        finally:
+            connection.close()
+        for suffix in ('-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+
+        os.replace(restore_path, db_path)
+    finally:
+        if os.path.exists(restore_path):
+            os.remove(restore_path)
+    return {'snapshot': snapshot, 'db_path': db_path, 'size_bytes': os.path.getsize(db_path)}
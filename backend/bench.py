@@ -0,0 +1,349 @@
+"""Нагрузочные замеры News API.
+
+Работает на временной копии базы (DATABASE_URL выставляется до импорта app),
+рабочий blog.db не трогает.
+
+    python bench.py asgi --concurrency 1,10,100,1000 --client-delay 20
+    python bench.py group-commit --threads 32 --comments 2000
+    python bench.py delete --sizes 10,10000,100000
+    python bench.py read-path --articles 5000 --repeat 20
+    python bench.py backup --mb 2048 --pages 256
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+_tmpdir = tempfile.mkdtemp(prefix='blog-bench-')
+os.environ.setdefault('DATABASE_URL', f'sqlite:///{os.path.join(_tmpdir, "bench.db")}')
+os.environ.setdefault('ADMISSION_ENABLED', '0')
+
+from datetime import datetime  # noqa: E402
+
+from app import (app, db, User, Article, Comment, delete_article_comments,  # noqa: E402
+                 purge_deleted_articles, fetch_articles, fetch_comments, serialize_article_item,
+                 database_path, comment_writer)
+from backup import backup_database, BackupError  # noqa: E402
+from jwt_auth import JWTManager  # noqa: E402
+
+
+def seed(articles=50, comments_per_article=20):
+    with app.app_context():
+        user = User.query.first()
+        for i in range(articles):
+            article = Article(title=f'Статья {i}', text='Текст статьи ' * 20,
+                              category='technology', user_id=user.id)
+            db.session.add(article)
+            db.session.flush()
+            for j in range(comments_per_article):
+                db.session.add(Comment(text=f'Комментарий {j}', author_name='Читатель',
+                                       article_id=article.id))
+        db.session.commit()
+        return [a.id for a in Article.query.all()]
+
+
+def report(label, latencies, elapsed):
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1] if latencies else 0
+    print(f'{label:<28} {len(latencies) / elapsed:>10.1f} req/s   '
+          f'p50 {statistics.median(latencies) * 1000:>8.1f} ms   p99 {p99 * 1000:>8.1f} ms')
+
+
+def bench_sync(paths, concurrency, client_delay, workers):
+    """Синхронный режим: поток воркера занят и во время медленной передачи данных клиентом"""
+    latencies = []
+    lock = threading.Lock()
+
+    def handle(path):
+        started = time.perf_counter()
+        time.sleep(client_delay)
+        with app.test_client() as client:
+            client.get(path)
+        with lock:
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=min(concurrency, workers)) as pool:
+        list(pool.map(handle, paths))
+    return latencies, time.perf_counter() - started
+
+
+def bench_async(paths, concurrency, client_delay):
+    """ASGI-режим: медленный клиент ждет в event loop, поток берется только под обработчик"""
+    from asgi import AsyncApp
+
+    application = AsyncApp(app)
+    latencies = []
+
+    async def handle(path):
+        started = time.perf_counter()
+
+        async def receive():
+            await asyncio.sleep(client_delay)
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            pass
+
+        path, _, query = path.partition('?')
+        scope = {'type': 'http', 'method': 'GET', 'path': path, 'query_string': query.encode(),
+                 'headers': [], 'http_version': '1.1', 'scheme': 'http'}
+        await application(scope, receive, send)
+        latencies.append(time.perf_counter() - started)
+
+    async def run():
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def limited(path):
+            async with semaphore:
+                await handle(path)
+
+        await asyncio.gather(*(limited(path) for path in paths))
+
+    started = time.perf_counter()
+    asyncio.run(run())
+    elapsed = time.perf_counter() - started
+    application.read_pool.shutdown()
+    application.write_pool.shutdown()
+    return latencies, elapsed
+
+
+def cmd_asgi(args):
+    ids = seed()
+    for concurrency in args.concurrency:
+        total = max(args.requests, concurrency)
+        paths = [f'/api/articles/{ids[i % len(ids)]}' if i % 2 else '/api/articles?limit=10'
+                 for i in range(total)]
+        print(f'-- concurrency {concurrency}, {total} запросов, задержка клиента '
+              f'{args.client_delay * 1000:.0f} ms')
+        report('sync (threads)', *bench_sync(paths, concurrency, args.client_delay, args.workers))
+        report('asgi (event loop)', *bench_async(paths, concurrency, args.client_delay))
+
+
+def cmd_group_commit(args):
+    ids = seed(articles=10, comments_per_article=0)
+    with app.app_context():
+        user = User.query.first()
+        headers = {'Authorization': f'Bearer {JWTManager.create_access_token(user.id, user.name)}'}
+
+    def post(i):
+        with app.test_client() as client:
+            response = client.post('/api/comments', headers=headers, json={
+                'article_id': ids[i % len(ids)], 'text': f'Комментарий {i}', 'author_name': 'Читатель'
+            })
+            assert response.status_code in (201, 503), response.get_json()
+            return response.status_code == 503
+
+    for admission in (False, True):
+        app.config['ADMISSION_ENABLED'] = admission
+        print(f'-- контроль допуска {"включен" if admission else "выключен"}')
+        for mode in (False, True):
+            app.config['COMMENT_GROUP_COMMIT'] = mode
+            batches, rows = comment_writer.batches, comment_writer.rows
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.threads) as pool:
+                rejected = sum(pool.map(post, range(args.comments)))
+            elapsed = time.perf_counter() - started
+            label = 'group commit' if mode else 'commit на запрос'
+            line = f'{label:<28} {(args.comments - rejected) / elapsed:>10.1f} вставок/с   503: {rejected}'
+            if mode:
+                line += f'   строк в пачке {(comment_writer.rows - rows) / max(comment_writer.batches - batches, 1):.1f}'
+            print(line)
+
+
+def create_article_with_comments(count):
+    user = User.query.first()
+    article = Article(title='Популярная статья', text='Текст статьи ' * 20, user_id=user.id)
+    db.session.add(article)
+    db.session.flush()
+    rows = [{'text': f'Комментарий {i}', 'author_name': 'Читатель', 'article_id': article.id,
+             'created_date': datetime.utcnow()} for i in range(count)]
+    if rows:
+        db.session.execute(Comment.__table__.insert(), rows)
+    db.session.commit()
+    return article.id
+
+
+def cmd_delete(args):
+    with app.app_context():
+        for size in args.sizes:
+            print(f'-- статья с {size} комментариями')
+
+            article_id = create_article_with_comments(size)
+            started = time.perf_counter()
+            db.session.delete(Article.query.get(article_id))
+            db.session.commit()
+            print(f'{"ORM cascade":<28} {(time.perf_counter() - started) * 1000:>10.1f} ms')
+
+            article_id = create_article_with_comments(size)
+            started = time.perf_counter()
+            delete_article_comments(article_id)
+            Article.query.filter_by(id=article_id).delete(synchronize_session=False)
+            db.session.commit()
+            print(f'{"bulk DELETE":<28} {(time.perf_counter() - started) * 1000:>10.1f} ms')
+
+            article_id = create_article_with_comments(size)
+            started = time.perf_counter()
+            Article.query.filter_by(id=article_id).update({'deleted_at': datetime.utcnow()})
+            db.session.commit()
+            soft_ms = (time.perf_counter() - started) * 1000
+            started = time.perf_counter()
+            result = purge_deleted_articles()
+            purge_ms = (time.perf_counter() - started) * 1000
+            print(f'{"soft delete + фон":<28} {soft_ms:>10.1f} ms   очистка {purge_ms:.1f} ms ({result})')
+
+
+def measure(label, fn, repeat):
+    """Строк в секунду и пик выделенной памяти за один проход"""
+    with app.app_context():
+        fn()
+        started = time.perf_counter()
+        for _ in range(repeat):
+            rows = fn()
+            db.session.remove()
+        elapsed = time.perf_counter() - started
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        db.session.remove()
+    print(f'{label:<28} {rows * repeat / elapsed:>10.0f} строк/с   пик {peak / 1024:>8.0f} KiB')
+
+
+def cmd_read_path(args):
+    seed(articles=args.articles, comments_per_article=2)
+
+    def orm_articles():
+        articles = Article.query.filter_by(deleted_at=None).order_by(Article.created_date.desc()).all()
+        return len([serialize_article_item(article, 0) for article in articles])
+
+    def core_articles():
+        return len([serialize_article_item(article, 0) for article in fetch_articles()])
+
+    def orm_comments():
+        return len([(c.id, c.text, c.author_name, c.created_date, c.article_id)
+                    for c in Comment.query.order_by(Comment.created_date.desc()).all()])
+
+    def core_comments():
+        return len(fetch_comments())
+
+    measure('статьи: ORM', orm_articles, args.repeat)
+    measure('статьи: Core + ArticleRow', core_articles, args.repeat)
+    measure('комментарии: ORM', orm_comments, args.repeat)
+    measure('комментарии: Core + CommentRow', core_comments, args.repeat)
+
+
+def fill_database(megabytes):
+    """Раздувает базу комментариями до megabytes МБ"""
+    with app.app_context():
+        article_id = create_article_with_comments(0)
+        text = 'Комментарий ' * 80
+        while os.path.getsize(database_path()) < megabytes * 1024 * 1024:
+            rows = [{'text': text, 'author_name': 'Читатель', 'article_id': article_id,
+                     'created_date': datetime.utcnow()} for _ in range(10000)]
+            db.session.execute(Comment.__table__.insert(), rows)
+            db.session.commit()
+        return article_id
+
+
+def write_latencies(article_id, stop):
+    """Писатель: по одному комментарию на транзакцию, пока не выставлен stop"""
+    latencies = []
+    with app.app_context():
+        while not stop.is_set():
+            started = time.perf_counter()
+            db.session.add(Comment(text='Комментарий', author_name='Писатель', article_id=article_id))
+            db.session.commit()
+            latencies.append(time.perf_counter() - started)
+            time.sleep(0.001)
+    return latencies
+
+
+def cmd_backup(args):
+    app.config['SQLITE_WAL'] = args.journal == 'wal'
+    with app.app_context():
+        # выйти из WAL можно, только когда других соединений с базой нет
+        db.session.remove()
+        db.engine.dispose()
+        db.session.execute(db.text(f'PRAGMA journal_mode={args.journal}'))
+        path = database_path()
+    article_id = fill_database(args.mb)
+    print(f'-- база {os.path.getsize(path) / 1024 / 1024:.0f} МБ, журнал {args.journal}, шаг {args.pages} страниц')
+
+    stop = threading.Event()
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        baseline = pool.submit(write_latencies, article_id, stop)
+        time.sleep(1)
+        stop.set()
+    print(f'{"писатель без бэкапа":<28} max {max(baseline.result()) * 1000:>8.1f} ms')
+
+    stop = threading.Event()
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        writer = pool.submit(write_latencies, article_id, stop)
+        try:
+            report = backup_database(path, os.path.join(_tmpdir, 'snapshot.db.gz'), pages=args.pages,
+                                     allow_blocking=args.allow_blocking, step_pause=args.step_pause / 1000)
+        except BackupError as error:
+            report = None
+            print(f'{"бэкап":<28} прерван: {error}')
+        finally:
+            stop.set()
+    latencies = writer.result()
+    if report is None:
+        return
+    print(f'{"писатель во время бэкапа":<28} max {max(latencies) * 1000:>8.1f} ms   '
+          f'p99 {sorted(latencies)[int(len(latencies) * 0.99) - 1] * 1000:.1f} ms   записей {len(latencies)}')
+    print(f'{"бэкап":<28} {report["throughput_mb_s"]:>8.1f} МБ/с   самый долгий шаг {report["longest_step_ms"]} ms   '
+          f'перезапусков {report["restarts"]}   режим {report["mode"]}   всего {report["total_ms"] / 1000:.1f} s   сжатие {report["size_bytes"] / report["compressed_bytes"]:.1f}x')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    asgi_parser = commands.add_parser('asgi', help='масштабирование по числу соединений: sync против ASGI')
+    asgi_parser.add_argument('--concurrency', type=lambda s: [int(x) for x in s.split(',')],
+                             default=[1, 10, 100, 1000])
+    asgi_parser.add_argument('--requests', type=int, default=2000)
+    asgi_parser.add_argument('--client-delay', type=lambda s: float(s) / 1000, default=0.02,
+                             help='время передачи запроса медленным клиентом, ms')
+    asgi_parser.add_argument('--workers', type=int, default=16,
+                             help='число потоков синхронного сервера')
+    asgi_parser.set_defaults(func=cmd_asgi)
+
+    group_parser = commands.add_parser('group-commit', help='вставка комментариев: commit на запрос против группового')
+    group_parser.add_argument('--threads', type=int, default=32)
+    group_parser.add_argument('--comments', type=int, default=2000)
+    group_parser.set_defaults(func=cmd_group_commit)
+
+    delete_parser = commands.add_parser('delete', help='удаление статьи: ORM cascade, bulk DELETE, мягкое')
+    delete_parser.add_argument('--sizes', type=lambda s: [int(x) for x in s.split(',')],
+                               default=[10, 10000, 100000])
+    delete_parser.set_defaults(func=cmd_delete)
+
+    read_parser = commands.add_parser('read-path', help='чтение списков: ORM-объекты против Core-строк')
+    read_parser.add_argument('--articles', type=int, default=5000)
+    read_parser.add_argument('--repeat', type=int, default=20)
+    read_parser.set_defaults(func=cmd_read_path)
+
+    backup_parser = commands.add_parser('backup', help='онлайн-бэкап: скорость и задержки писателя')
+    backup_parser.add_argument('--mb', type=int, default=200, help='размер базы, МБ')
+    backup_parser.add_argument('--pages', type=int, default=256)
+    backup_parser.add_argument('--journal', choices=['wal', 'delete'], default='wal')
+    backup_parser.add_argument('--step-pause', type=float, default=0, help='пауза после шага, ms')
+    backup_parser.add_argument('--allow-blocking', action='store_true',
+                               help='без WAL копировать одним шагом после max_restarts')
+    backup_parser.set_defaults(func=cmd_backup)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
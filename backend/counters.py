@@ -0,0 +1,96 @@
+"""Буферизованные счетчики: инкременты в памяти, запись в БД пачками.
+
+Счетчик разбит на шарды со своими блокировками, чтобы потоки, считающие
+разные ключи, не ждали друг друга. Фоновый поток раз в flush_interval
+секунд забирает накопленные приращения из всех шардов и передает их
+apply_fn одной транзакцией. apply_fn должна прибавлять приращение
+(views = views + delta), а не записывать итог: тогда несколько процессов
+с собственными буферами не затирают чужие данные. Если запись упала,
+приращения возвращаются в буфер и уйдут со следующей пачкой.
+
+Падение процесса теряет не больше flush_interval секунд счета; при
+нормальном завершении буфер сбрасывается через atexit.
+"""
+import atexit
+import threading
+import time
+
+
+class ShardedCounter:
+    def __init__(self, app, db, apply_fn, shards=16, flush_interval=5.0):
+        self.app = app
+        self.db = db
+        self.apply_fn = apply_fn
+        self.flush_interval = flush_interval
+        self.flushes = 0
+        self.rows = 0
+        self.errors = 0
+        self.last_flush_ms = None
+        self._shards = [({}, threading.Lock()) for _ in range(shards)]
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def hit(self, key, amount=1):
+        self._ensure_started()
+        counts, lock = self._shards[hash(key) % len(self._shards)]
+        with lock:
+            counts[key] = counts.get(key, 0) + amount
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='view-counter', daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def _drain(self):
+        deltas = {}
+        for counts, lock in self._shards:
+            with lock:
+                drained = counts.copy()
+                counts.clear()
+            for key, amount in drained.items():
+                deltas[key] = deltas.get(key, 0) + amount
+        return deltas
+
+    def flush(self):
+        """Записывает накопленные приращения одной транзакцией; возвращает число ключей"""
+        with self._flush_lock:
+            deltas = self._drain()
+            if not deltas:
+                return 0
+            started = time.perf_counter()
+            with self.app.app_context():
+                session = self.db.session
+                try:
+                    self.apply_fn(deltas)
+                    session.commit()
+                except Exception:
+                    session.rollback()
+                    self.errors += 1
+                    self.app.logger.exception('Не удалось записать счетчики, повтор со следующей пачкой')
+                    for key, amount in deltas.items():
+                        self.hit(key, amount)
+                    return 0
+            self.flushes += 1
+            self.rows += len(deltas)
+            self.last_flush_ms = round((time.perf_counter() - started) * 1000, 2)
+            return len(deltas)
+
+    def stats(self):
+        return {
+            'flush_interval': self.flush_interval,
+            'flushes': self.flushes,
+            'rows': self.rows,
+            'errors': self.errors,
+            'last_flush_ms': self.last_flush_ms,
+            'pending': sum(len(counts) for counts, _ in self._shards)
+        }
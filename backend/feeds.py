@@ -0,0 +1,127 @@
+"""Заранее собранные ленты статей: главная и по категориям.
+
+Лента - это список id первых size статей (плюс одна, чтобы знать, полная ли
+лента) и кэш уже сериализованных в JSON элементов для каждой статьи.
+Изменение статьи сбрасывает ее элемент и затронутые ленты, изменение числа
+комментариев - только элемент. Сброшенное пересобирается при следующем
+запросе, остальное берется готовым.
+
+Изменения из других процессов замечаются по отпечатку (fingerprint) не
+позже чем через check_interval секунд; тогда сбрасывается все. Если задан
+path, снимок сохраняется в файл и подхватывается при старте, а отпечаток
+проверяет его при первом же запросе.
+"""
+import json
+import os
+import threading
+import time
+
+
+class FeedSnapshots:
+    def __init__(self, load_ids, render, fingerprint, size=50, check_interval=1.0, path=None):
+        self.load_ids = load_ids
+        self.render = render
+        self.fingerprint = fingerprint
+        self.size = size
+        self.check_interval = check_interval
+        self.path = path
+        self.hits = 0
+        self.rebuilds = 0
+        self._lock = threading.Lock()
+        self._feeds = {}
+        self._items = {}
+        self._fingerprint = None
+        self._checked = 0.0
+        self._load()
+
+    def get(self, category=None):
+        """Возвращает (полная ли лента, список готовых элементов) для категории или главной"""
+        with self._lock:
+            self._validate()
+            changed = False
+            ids = self._feeds.get(category)
+            if ids is None:
+                ids = self._feeds[category] = self.load_ids(category, self.size + 1)
+                changed = True
+            complete = len(ids) <= self.size
+            missing = [article_id for article_id in ids if article_id not in self._items]
+            if missing:
+                rendered = self.render(missing)
+                self._items.update(rendered)
+                changed = True
+                if len(rendered) < len(missing):
+                    # статью удалили (например, другим процессом) между запросом id и элементов
+                    ids = [article_id for article_id in ids if article_id in self._items]
+                    if complete:
+                        self._feeds[category] = ids
+                    else:
+                        # за укороченной неполной лентой могут быть другие статьи: собрать заново
+                        del self._feeds[category]
+            items = [self._items[article_id] for article_id in ids[:self.size]]
+            if changed:
+                self.rebuilds += 1
+                live = set().union(*self._feeds.values())
+                self._items = {key: item for key, item in self._items.items() if key in live}
+                self._save()
+            else:
+                self.hits += 1
+            return complete, items
+
+    def article_changed(self, article_id, *categories):
+        """Статья создана, изменена или удалена: сбросить ее элемент и ленты, где она есть"""
+        with self._lock:
+            self._items.pop(article_id, None)
+            self._feeds.pop(None, None)
+            for category in categories:
+                self._feeds.pop(category, None)
+
+    def comments_changed(self, article_id):
+        with self._lock:
+            self._items.pop(article_id, None)
+
+    def _validate(self):
+        now = time.monotonic()
+        if now - self._checked < self.check_interval:
+            return
+        self._checked = now
+        fingerprint = self.fingerprint()
+        if fingerprint != self._fingerprint:
+            self._feeds.clear()
+            self._items.clear()
+            self._fingerprint = fingerprint
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding='utf-8') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return
+        self._fingerprint = data['fingerprint']
+        self._feeds = {None if key == '' else key: ids for key, ids in data['feeds'].items()}
+        self._items = {int(article_id): {kind: fragment.encode('utf-8') for kind, fragment in item.items()}
+                       for article_id, item in data['items'].items()}
+
+    def _save(self):
+        if not self.path:
+            return
+        data = {
+            'fingerprint': self._fingerprint,
+            'feeds': {'' if key is None else key: ids for key, ids in self._feeds.items()},
+            'items': {article_id: {kind: fragment.decode('utf-8') for kind, fragment in item.items()}
+                      for article_id, item in self._items.items()}
+        }
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(data, file, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def stats(self):
+        return {
+            'size': self.size,
+            'feeds': len(self._feeds),
+            'items': len(self._items),
+            'hits': self.hits,
+            'rebuilds': self.rebuilds
+        }
@@ -0,0 +1,111 @@
+"""Групповой commit: записи из многих запросов попадают в одну транзакцию.
+
+Фоновый поток собирает записи из очереди, пока не наберется max_batch штук
+или не пройдет flush_interval секунд с первой, и выполняет их одной
+транзакцией. Если пачка падает, она откатывается и повторяется по одной
+записи в отдельных транзакциях, так что каждый вызывающий получает свой
+результат или свое исключение. SAVEPOINT не используется: драйвер pysqlite
+в режиме по умолчанию фиксирует каждый RELEASE отдельно.
+
+Долговечность: ответ возвращается только после commit всей пачки, так что
+подтвержденная запись так же надежна, как при commit на каждый запрос.
+Падение процесса до commit теряет всю текущую пачку, но ни одна запись из
+нее еще не была подтверждена клиенту. Цена - до flush_interval
+дополнительной задержки на запись.
+
+Вызывающий, который не дождался результата, отменяет Future. Отмененная
+запись выбрасывается из пачки и не попадает в базу, так что повтор запроса
+клиентом не создает дубликат. Если пачка уже начала писаться, отменить
+запись нельзя (cancel() вернет False), и ее результат нужно дождаться.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class GroupCommitQueue:
+    def __init__(self, app, db, write_fn, flush_interval=0.005, max_batch=100):
+        self.app = app
+        self.db = db
+        self.write_fn = write_fn
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.batches = 0
+        self.rows = 0
+        self.cancelled = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, item):
+        """Ставит запись в очередь; Future вернет результат write_fn(item) после commit"""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='group-commit', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            self._flush(batch)
+
+    def _flush(self, batch):
+        # после этой проверки запись уже не отменить: вызывающий дождется ее результата
+        running = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+        self.cancelled += len(batch) - len(running)
+        batch = running
+        if not batch:
+            return
+        with self.app.app_context():
+            session = self.db.session
+            try:
+                results = [self.write_fn(item) for item, _ in batch]
+                session.commit()
+            except Exception:
+                session.rollback()
+                self._flush_each(batch)
+                return
+        self.batches += 1
+        self.rows += len(batch)
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def _flush_each(self, batch):
+        """Повтор упавшей пачки по одной записи, чтобы ошибка досталась только своему запросу"""
+        session = self.db.session
+        for item, future in batch:
+            try:
+                result = self.write_fn(item)
+                session.commit()
+            except Exception as error:
+                session.rollback()
+                future.set_exception(error)
+            else:
+                self.rows += 1
+                future.set_result(result)
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'rows': self.rows,
+            'pending': self._queue.qsize(),
+            'cancelled': self.cancelled
+        }
@@ -0,0 +1,157 @@
+"""Фоновое обслуживание базы: периодические задачи в отдельном потоке.
+
+Каждая задача выполняется под файловой блокировкой лидера, поэтому при
+нескольких процессах одну и ту же задачу в данный момент выполняет только
+один из них. В файле блокировки хранится время последнего запуска, и
+остальные процессы не повторяют задачу раньше ее интервала. Пока сервер
+занят живыми запросами, задачи откладываются.
+"""
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class LeaderLock:
+    """Неблокирующая межпроцессная блокировка на файле"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def acquire(self):
+        file = open(self.path, 'a+')
+        try:
+            if fcntl:
+                fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            file.close()
+            return False
+        self._file = file
+        return True
+
+    def release(self):
+        if fcntl:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        else:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        self._file.close()
+        self._file = None
+
+    def read_last_run(self):
+        self._file.seek(0)
+        try:
+            return float(self._file.read().strip() or 0)
+        except ValueError:
+            return 0.0
+
+    def write_last_run(self, timestamp):
+        self._file.seek(0)
+        self._file.truncate()
+        self._file.write(str(timestamp))
+        self._file.flush()
+
+
+class Job:
+    def __init__(self, name, interval, fn):
+        self.name = name
+        self.interval = interval
+        self.fn = fn
+        self.next_run = time.monotonic() + interval
+        self.stats = {
+            'interval': interval,
+            'runs': 0,
+            'errors': 0,
+            'skipped_busy': 0,
+            'skipped_locked': 0,
+            'last_run': None,
+            'last_duration_ms': None,
+            'last_result': None
+        }
+
+
+class MaintenanceScheduler:
+    def __init__(self, app, lock_dir, is_busy=lambda: False, tick=1.0, busy_retry=5.0):
+        self.app = app
+        self.lock_dir = lock_dir
+        self.is_busy = is_busy
+        self.tick = tick
+        self.busy_retry = busy_retry
+        self.jobs = {}
+        self.enabled = []
+        self._thread = None
+        self._stop = threading.Event()
+
+    def job(self, name, interval):
+        """Декоратор: регистрирует функцию как задачу, выполняемую раз в interval секунд"""
+        def decorator(fn):
+            self.jobs[name] = Job(name, interval, fn)
+            return fn
+        return decorator
+
+    def start(self, jobs=None):
+        """Запускает фоновый поток для всех задач или только для перечисленных в jobs"""
+        if self._thread is None:
+            self.enabled = list(jobs or self.jobs)
+            self._thread = threading.Thread(target=self._run, name='maintenance', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.tick):
+            for name in self.enabled:
+                job = self.jobs[name]
+                if time.monotonic() < job.next_run:
+                    continue
+                if self.is_busy():
+                    job.stats['skipped_busy'] += 1
+                    job.next_run = time.monotonic() + self.busy_retry
+                    continue
+                self.run_job(job.name)
+                job.next_run = time.monotonic() + job.interval
+
+    def run_job(self, name, force=False):
+        """Выполняет задачу под блокировкой лидера; force игнорирует интервал с прошлого запуска"""
+        job = self.jobs[name]
+        lock = LeaderLock(os.path.join(self.lock_dir, f'maintenance-{name}.lock'))
+        if not lock.acquire():
+            job.stats['skipped_locked'] += 1
+            return None
+        try:
+            if not force and time.time() - lock.read_last_run() < job.interval:
+                job.stats['skipped_locked'] += 1
+                return None
+            started = time.perf_counter()
+            try:
+                with self.app.app_context():
+                    result = job.fn()
+            except Exception as error:
+                job.stats['errors'] += 1
+                result = f'ошибка: {error}'
+                self.app.logger.exception('Задача обслуживания %s завершилась с ошибкой', name)
+            job.stats['runs'] += 1
+            job.stats['last_run'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+            job.stats['last_duration_ms'] = round((time.perf_counter() - started) * 1000, 2)
+            job.stats['last_result'] = result
+            lock.write_last_run(time.time())
+            return result
+        finally:
+            lock.release()
+
+    def stats(self):
+        return {
+            'running': self._thread is not None and not self._stop.is_set(),
+            'enabled': self.enabled,
+            'jobs': {name: dict(job.stats) for name, job in self.jobs.items()}
+        }
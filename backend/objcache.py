@@ -0,0 +1,98 @@
+"""Общий для процесса read-through кэш сводок пользователей и статей.
+
+Хранит не ORM-объекты (они привязаны к сессии), а маленькие неизменяемые
+значения на __slots__. Размер ограничен (LRU), записи живут не дольше ttl
+секунд; обработчики изменений сбрасывают свои ключи сами, а другие
+процессы увидят изменение не позже чем через ttl.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class FrozenRecord:
+    __slots__ = ()
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            object.__setattr__(self, name, values[name])
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{type(self).__name__} нельзя изменять')
+
+    def __delattr__(self, name):
+        raise AttributeError(f'{type(self).__name__} нельзя изменять')
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __hash__(self):
+        return hash(tuple(getattr(self, name) for name in self.__slots__))
+
+    def __repr__(self):
+        fields = ', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)
+        return f'{type(self).__name__}({fields})'
+
+
+class UserSummary(FrozenRecord):
+    __slots__ = ('id', 'name', 'email')
+
+
+class ArticleSummary(FrozenRecord):
+    __slots__ = ('id', 'title', 'category', 'user_id')
+
+
+class ReadThroughCache:
+    def __init__(self, loader, max_size=1000, ttl=60):
+        self.loader = loader
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        """Значение из кэша или из loader(key); отсутствующие записи (None) не кэшируются"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            generation = self._generation
+
+        value = self.loader(key)
+        if value is not None:
+            with self._lock:
+                # сброс во время загрузки: загруженное значение могло устареть
+                if generation != self._generation:
+                    return value
+                self._entries[key] = (value, now + self.ttl)
+                self._entries.move_to_end(key)
+                if len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses
+        }
@@ -0,0 +1,95 @@
+"""Объединение одинаковых одновременных запросов (single-flight).
+
+Первый запрос с данным ключом выполняет вычисление, остальные ждут его
+и получают тот же результат или то же исключение.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class SingleFlightTimeout(Exception):
+    """Ожидающий запрос не дождался результата ведущего"""
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self, timeout=5.0, max_tracked_keys=1000):
+        self.timeout = timeout
+        self.max_tracked_keys = max_tracked_keys
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._metrics = OrderedDict()
+
+    def do(self, key, fn, timeout=None):
+        """Возвращает fn() для ключа, выполняя ее не более одного раза одновременно"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+            metrics = self._key_metrics(key)
+            metrics['requests'] += 1
+
+        if leader:
+            return self._run(key, call, fn)
+
+        done = call.done.wait(self.timeout if timeout is None else timeout)
+        with self._lock:
+            call.waiters -= 1
+            self._key_metrics(key)['shared' if done else 'timeouts'] += 1
+        if not done:
+            raise SingleFlightTimeout(key)
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def _run(self, key, call, fn):
+        started = time.perf_counter()
+        try:
+            call.result = fn()
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                metrics = self._key_metrics(key)
+                metrics['executions'] += 1
+                metrics['last_duration_ms'] = round((time.perf_counter() - started) * 1000, 2)
+                if call.error is not None:
+                    metrics['errors'] += 1
+            call.done.set()
+        return call.result
+
+    def _key_metrics(self, key):
+        metrics = self._metrics.get(key)
+        if metrics is None:
+            metrics = self._metrics[key] = {
+                'requests': 0, 'executions': 0, 'shared': 0,
+                'errors': 0, 'timeouts': 0, 'last_duration_ms': None
+            }
+            if len(self._metrics) > self.max_tracked_keys:
+                self._metrics.popitem(last=False)
+        else:
+            self._metrics.move_to_end(key)
+        return metrics
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'waiting': sum(call.waiters for call in self._calls.values()),
+                'keys': {key: dict(metrics) for key, metrics in self._metrics.items()}
+            }